@@ -4,19 +4,29 @@
 
 import os, sys, json
 from sys import argv
+from roperf_stats import LatencyHistogram, histogram_from_dict, report_percentiles, usec_per_sec
+from roperf_stats import read_rsptime_header, header_size, record_dtype_spec, find_knee
+
+# numpy is only needed for timeline analysis of response time files
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
 
 bytes_per_GiB = 1<<30
 bytes_per_MiB = 1<<20
 
 def usage(msg):
 	print('ERROR: %s' % msg)
-	print('usage: analyze-roperf-logs.py --directory path')
+	print('usage: analyze-roperf-logs.py --directory path [ --interval secs ]')
 	sys.exit(1)
 
 # define default values
 
 directory = None
 pct_done_threshold = 70.0
+interval = 1.0  # seconds per timeline sample
 
 # parse command line
 
@@ -32,6 +42,10 @@ while arg_index < len(argv):
     if not os.path.isdir(pval):
       usage('%s: not a directory' % pval)
     directory = pval
+  elif pname == 'interval':
+    interval = float(pval)
+    if interval <= 0.0:
+      usage('--interval must be greater than zero')
 
 if not directory:
   usage('you must supply directory containing json results')
@@ -49,7 +63,12 @@ for f in contents:
     with open(path, 'r') as jsonf:
       try:
         next_thread = json.load(jsonf)
-        threads[thrd_id] = next_thread
+        if 'workers' in next_thread:
+          # process ran multiple workers, each with its own thread ID
+          for w in next_thread['workers']:
+            threads[int(w['params']['thread_id'])] = w
+        else:
+          threads[thrd_id] = next_thread
       except ValueError:
         print('unable to load from %s' % path)
       #print(json.dumps(next_thread, indent=4))
@@ -61,6 +80,10 @@ any_thread = threads[1]
 op_type = any_thread['params']['rq_type']
 if op_type == 'write' or op_type == 'read' or op_type == 'cleanup' or op_type == 'list':
   unit = 'object'
+elif op_type == 'mix':
+  unit = 'request'
+elif op_type == 'xattr-write' or op_type == 'xattr-read':
+  unit = 'attr'
 else:
   unit = 'key-value-pair'
 
@@ -70,6 +93,16 @@ max_elapsed = 0.0
 min_elapsed = 100000000000.0
 total_units_requested = 0
 total_data_requested = 0.0
+histograms = {}  # request type -> latency histogram merged across threads
+rq_type_thru = {}  # request type -> sum of per-thread throughputs with --mix
+total_target_rate = 0.0  # open-loop offered load, requests/sec
+total_achieved_rate = 0.0
+max_send_lag = 0.0
+total_verified = 0  # objects checked by --verify
+total_verify_failures = 0
+total_verify_secs = 0.0
+max_shard_skew = 0.0  # worst --omap-shards p99 skew of any thread
+qdepth_steps = []  # per --qdepth-search step: [ qdepth, total throughput, merged histogram ]
 for t in threads.values():
   params = t['params']
   try:
@@ -80,12 +113,37 @@ for t in threads.values():
   total_units_done += units_done
   max_elapsed = max(max_elapsed, t['results']['elapsed'])
   min_elapsed = min(min_elapsed, t['results']['elapsed'])
-  if unit == 'object':
+  if unit == 'object' or unit == 'request':
     total_units_requested += params['obj_count']
-    if obj_size is not None:
+    if obj_size is not None and unit == 'object':
       total_data_requested += ((obj_size * units_done) / bytes_per_GiB)
+  elif unit == 'attr':
+    total_units_requested += params['obj_count'] * params['xattr_count']
   else:
     total_units_requested += params['omap_key_count']
+  if 'target_rate' in t['results']:
+    total_target_rate += t['results']['target_rate']
+    total_achieved_rate += t['results']['achieved_rate']
+    max_send_lag = max(max_send_lag, t['results']['max_send_lag'])
+  max_shard_skew = max(max_shard_skew, t['results'].get('shard_p99_skew', 0.0))
+  if 'verify' in t['results']:
+    total_verified += t['results']['verify']['objects']
+    total_verify_failures += t['results']['verify']['failures']
+    total_verify_secs += t['results']['verify']['secs']
+  for (k, st) in enumerate(t['results'].get('qdepth_steps', [])):
+    if k == len(qdepth_steps):
+      qdepth_steps.append([ st['qdepth'], 0.0, histogram_from_dict(st['latency']) ])
+    else:
+      qdepth_steps[k][2].merge(histogram_from_dict(st['latency']))
+    qdepth_steps[k][1] += st['throughput']
+  for (rq_type, r) in t['results'].get('rq_types', {}).items():
+    rq_type_thru[rq_type] = rq_type_thru.get(rq_type, 0.0) + r['throughput']
+  for (rq_type, lat) in t['results'].get('latency', {}).items():
+    h = histogram_from_dict(lat)
+    if rq_type in histograms:
+      histograms[rq_type].merge(h)
+    else:
+      histograms[rq_type] = h
 if op_type == 'write' or op_type == 'read':
   #total_xfer_rate += t['results']['transfer_rate']
   total_xfer_rate_MiB = (total_units_done * obj_size / bytes_per_MiB) / min_elapsed
@@ -95,14 +153,190 @@ print('min elapsed time: %f' % min_elapsed)
 print('total objects done while all threads running: %d' % total_units_done)
 print('total objects requested: %d' % total_units_requested)
 print('average throughput while all threads running (objs/sec): %f' % (total_units_done / max_elapsed))
-if obj_size is not None:
+if obj_size is not None and unit == 'object':
   print('total data requested (GiB): %f' % total_data_requested )
 pct_units_done = 100.0 * total_units_done / total_units_requested
 if total_xfer_rate_MiB > 0.0:
   print('avg. transfer rate while all threads running (MiB/s): %f' % total_xfer_rate_MiB)
 print('%% %ss done: %f' % (unit, pct_units_done))
+for (rq_type, thru) in sorted(rq_type_thru.items()):
+  print('%s throughput, sum of threads (requests/sec): %f' % (rq_type, thru))
+if total_target_rate > 0.0:
+  print('open-loop offered load (requests/sec): %f' % total_target_rate)
+  print('open-loop achieved rate (requests/sec): %f' % total_achieved_rate)
+  print('achieved rate short of offered load by: %f%%' % max(0.0,
+        100.0 * (total_target_rate - total_achieved_rate) / total_target_rate))
+  print('most behind schedule a request was sent (sec): %f' % max_send_lag)
+if max_shard_skew > 0.0:
+  print('worst slowest/fastest omap shard p99 ratio of any thread: %f' % max_shard_skew)
+if total_verified > 0:
+  print('objects verified: %d, failures: %d' % (total_verified, total_verify_failures))
+  print('verification time, sum of threads (sec): %f, per object (usec): %f' % (
+        total_verify_secs, total_verify_secs * usec_per_sec / total_verified))
+if len(qdepth_steps) > 0:
+  print('queue depth search, all threads:')
+  print('qdepth  throughput (%ss/sec)  p99 response time (sec)' % unit)
+  for (qdepth, thru, h) in qdepth_steps:
+    print('%6d  %24f  %23f' % (qdepth, thru, h.percentile(99.0)))
+  knee_gain_pct = any_thread['params'].get('knee_gain_pct', 10.0)
+  (knee, leveled_off) = find_knee([ (qdepth, thru) for (qdepth, thru, h) in qdepth_steps ], knee_gain_pct)
+  if leveled_off:
+    print('throughput knee at qdepth %d, where doubling qdepth gained less than %g%%' % (knee, knee_gain_pct))
+  else:
+    print('throughput still gained %g%% or more at qdepth %d, try a larger --qdepth-search' % (
+          knee_gain_pct, knee))
+for (rq_type, h) in sorted(histograms.items()):
+  print('%s response time percentiles across all threads (sec):' % rq_type)
+  for pct in report_percentiles:
+    print('  p%g: %f' % (pct, h.percentile(pct)))
+  print('  max: %f' % (h.max_usec / usec_per_sec))
 print('log directory is %s' % directory)
 if pct_units_done < pct_done_threshold:
   print('WARNING: fewer than %d%% requested %ss were processed in measurement interval' % (
          pct_done_threshold, unit))
 
+
+# timeline analysis of per-thread response time files
+#
+# each file holds (completion time, response time) records for one thread,
+# either in the binary format written by roperf_stats.RspTimeRecorder
+# (.rsp) or in CSV format (.csv).
+# throughput is counted from real completion timestamps in the interval
+# where every thread was running, from the last thread's first completion
+# to the first thread's last completion, so it is not distorted by threads
+# that started or finished at different times.  binary files are
+# memory-mapped and processed a block at a time, so memory use does not
+# depend on how big the run was.
+
+block_records = 1<<22
+
+# read first and last record of a CSV response time file without parsing it
+
+def csv_time_bounds(path):
+  with open(path, 'rb') as rspf:
+    first = rspf.readline()
+    if len(first) == 0:
+      return None
+    rspf.seek(0, os.SEEK_END)
+    rspf.seek(max(0, rspf.tell() - 256))
+    last = rspf.read().splitlines()[-1]
+  return (float(first.split(b',')[0]), float(last.split(b',')[0]))
+
+# map the records of a binary response time file
+# returns (clock base, records), records is None if there are none
+
+def map_rsptime_file(path):
+  with open(path, 'rb') as rspf:
+    clock_base = read_rsptime_header(rspf)['clock_base']
+  if os.path.getsize(path) - header_size < np.dtype(record_dtype_spec).itemsize:
+    return (clock_base, None)
+  records = np.memmap(path, dtype=np.dtype(record_dtype_spec), mode='r', offset=header_size)
+  return (clock_base, records)
+
+def time_bounds(path):
+  if path.endswith('.csv'):
+    return csv_time_bounds(path)
+  (clock_base, records) = map_rsptime_file(path)
+  if records is None:
+    return None
+  return (clock_base + records[0]['offset'], clock_base + records[-1]['offset'])
+
+# iterate over blocks of (completion times, response times, statuses) arrays,
+# statuses is None for CSV files, which don't have them
+
+def rsptime_blocks(path):
+  if path.endswith('.csv'):
+    a = np.loadtxt(path, delimiter=',', ndmin=2)
+    if a.size > 0:
+      yield (a[:,0], a[:,1], None)
+    return
+  (clock_base, records) = map_rsptime_file(path)
+  if records is None:
+    return
+  for k in range(0, len(records), block_records):
+    block = records[k:k+block_records]
+    yield (block['offset'] + clock_base, block['latency'].astype(np.float64), block['status'])
+
+# vectorized LatencyHistogram.bucket_index() for an array of response times
+
+def record_rsptimes(h, rsp_times):
+  usec = np.rint(rsp_times * usec_per_sec).astype(np.int64)
+  (mantissa, bit_length) = np.frexp(usec)
+  shift = np.maximum(bit_length - h.sub_bucket_bits, 1)
+  index = np.where(usec < h.sub_buckets, usec,
+                   h.sub_buckets + (shift - 1) * h.half_buckets + (usec >> shift) - h.half_buckets)
+  (indexes, counts) = np.unique(index, return_counts=True)
+  for (k, ct) in zip(indexes.tolist(), counts.tolist()):
+    h.counts[k] = h.counts.get(k, 0) + ct
+  h.total += len(usec)
+  h.max_usec = max(h.max_usec, int(usec.max()))
+
+def analyze_timeline(rsptime_files):
+  bounds = []
+  for path in rsptime_files:
+    b = time_bounds(path)
+    if b is not None:
+      bounds.append(b)
+  if len(bounds) < len(rsptime_files):
+    print('WARNING: %d response time files were empty' % (len(rsptime_files) - len(bounds)))
+  if len(bounds) == 0:
+    return
+  window_start = max([ b[0] for b in bounds ])
+  window_end = min([ b[1] for b in bounds ])
+  if window_end <= window_start:
+    print('no interval where all threads were running, no timeline analysis')
+    return
+  sample_count = int((window_end - window_start) / interval)
+  if sample_count == 0:
+    print('interval where all threads were running is shorter than --interval %f' % interval)
+    return
+  window_end = window_start + sample_count * interval  # only whole samples
+  samples = np.zeros(sample_count, dtype=np.int64)
+  window_histogram = LatencyHistogram()
+  failures = 0
+  for path in rsptime_files:
+    for (completions, rsp_times, statuses) in rsptime_blocks(path):
+      in_window = (completions >= window_start) & (completions < window_end)
+      completions = completions[in_window]
+      if len(completions) == 0:
+        continue
+      sample = ((completions - window_start) / interval).astype(np.int64)
+      samples += np.bincount(sample, minlength=sample_count)[0:sample_count]
+      record_rsptimes(window_histogram, rsp_times[in_window])
+      if statuses is not None:
+        failures += int(np.count_nonzero(statuses[in_window]))
+  ops_per_sec = samples / interval
+  bytes_per_op = None
+  if (op_type == 'write' or op_type == 'read') and obj_size is not None:
+    bytes_per_op = obj_size
+  timeline_path = os.path.join(directory, 'timeline.csv')
+  with open(timeline_path, 'w') as timelinef:
+    for k in range(0, sample_count):
+      if bytes_per_op is None:
+        timelinef.write('%f, %f\n' % (k * interval, ops_per_sec[k]))
+      else:
+        timelinef.write('%f, %f, %f\n' % (k * interval, ops_per_sec[k],
+                        ops_per_sec[k] * bytes_per_op / bytes_per_MiB))
+  print('')
+  print('interval where all %d threads were running: %f sec' % (len(bounds), window_end - window_start))
+  print('requests completed in that interval: %d' % samples.sum())
+  if failures > 0:
+    print('requests that returned an error in that interval: %d' % failures)
+  print('requests/sec in %g-sec samples: mean %f, min %f, max %f, std. dev. %f' % (
+         interval, ops_per_sec.mean(), ops_per_sec.min(), ops_per_sec.max(), ops_per_sec.std()))
+  if bytes_per_op is not None:
+    print('transfer rate in that interval (MiB/s): %f' % (ops_per_sec.mean() * bytes_per_op / bytes_per_MiB))
+  print('response time percentiles in that interval (sec):')
+  for pct in report_percentiles:
+    print('  p%g: %f' % (pct, window_histogram.percentile(pct)))
+  print('  max: %f' % (window_histogram.max_usec / usec_per_sec))
+  print('per-sample throughput is in %s' % timeline_path)
+
+rsptime_files = sorted([ os.path.join(directory, f) for f in contents
+                         if f.startswith('rados-wl-thread') and
+                            (f.endswith('.rsp') or f.endswith('.csv')) ])
+if len(rsptime_files) > 0:
+  if np is None:
+    print('numpy is not installed, skipping timeline analysis of response time files')
+  else:
+    analyze_timeline(rsptime_files)
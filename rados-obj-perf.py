@@ -0,0 +1,316 @@
+#!/usr/bin/python3
+#
+# rados-obj-perf.py - launch a distributed test
+# using threads running rados_object_perf.py
+#
+# unlike rados-obj-perf.sh, this launches on all client hosts in parallel,
+# using one reused ssh connection per host, and starts all of a host's
+# threads with a single remote command that reports each thread's exit status
+#
+# GNU V2 license at
+#   https://github.com/bengland2/rados_object_perf/blob/master/LICENSE
+#
+
+import os, sys, time, subprocess, shutil, tempfile, atexit
+from roperf_launch import OK, NOTOK, remote_dir, SshTransport, LocalTransport
+from roperf_launch import on_all_hosts, host_launch_cmd, parse_exit_status
+
+# files that client hosts need to run a thread,
+# found in the same directory as this script
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+client_files = [ os.path.join(script_dir, f) for f in [ 'rados_object_perf.py', 'roperf_stats.py', 'roperf_data.py',
+                                                        'roperf_placement.py', 'roperf_access.py' ] ]
+
+def usage(msg):
+  print('ERROR: ' + msg)
+  print('usage: rados-obj-perf.py ')
+  print('  --request-type write|read|list|omap-write|omap-read|omap-get|omap-range|xattr-write|xattr-read|cleanup')
+  print('  --mix type:weight,... (read, write, omap-write, instead of --request-type)')
+  print('  --threads count (default 2)')
+  print('  --workers per-thread-count (default 1)')
+  print('  --obj-size bytes')
+  print('  --obj-count objects')
+  print('  --omap-key-count keys')
+  print('  --omap-value-size bytes')
+  print('  --omap-kvpairs-per-call count')
+  print('  --think-time secs (default 0.1)')
+  print('  --adjust-think-time true|false (default true)')
+  print('  --drop-cache true|false (default true, only for read test)')
+  print('  --conf ceph-conf-file (default /etc/ceph/ceph.conf)')
+  print('  --pool pool-name (default radosperftest)')
+  print('  --client-list path (default rados_perf_clients.list)')
+  print('  --osd-list path (default osds.list)')
+  print('  --transport ssh|local (default ssh)')
+  print('any other --name value pair is passed to rados_object_perf.py')
+  sys.exit(NOTOK)
+
+
+# default values for input parameters
+
+conffile = '/etc/ceph/ceph.conf'
+client_list = 'rados_perf_clients.list'
+osd_list = 'osds.list'
+poolnm = 'radosperftest'
+wltype = 'cleanup'
+threads = 2
+workers = 1
+thinktime = '0.1'
+adjustthink = 'true'
+dropcache = True
+transport_type = 'ssh'
+objsize = None
+objcount = None
+omapkeycount = None
+omapvaluesize = None
+omapkvpairspercall = None
+mix = None
+passthru_args = []
+
+# parse command line inputs
+
+if len(sys.argv) < 2: usage('no parameters at all?')
+arg_index = 1
+while arg_index < len(sys.argv):
+  if arg_index + 1 == len(sys.argv): usage('every parameter must have a value ')
+  pname = sys.argv[arg_index]
+  if not pname.startswith('--'): usage('every parameter name must start with --')
+  pname = pname[2:]
+  pval = sys.argv[arg_index+1]
+  arg_index += 2
+  if pname == 'request-type':
+    wltype = pval
+  elif pname == 'mix':
+    mix = pval
+    wltype = 'mix'
+  elif pname == 'obj-size':
+    objsize = pval
+  elif pname == 'obj-count':
+    objcount = pval
+  elif pname == 'threads':
+    threads = int(pval)
+  elif pname == 'workers':
+    workers = int(pval)
+  elif pname == 'omap-value-size':
+    omapvaluesize = pval
+  elif pname == 'omap-key-count':
+    omapkeycount = pval
+  elif pname == 'omap-kvpairs-per-call':
+    omapkvpairspercall = pval
+  elif pname == 'think-time':
+    thinktime = pval
+  elif pname == 'adjust-think-time':
+    adjustthink = pval
+  elif pname == 'drop-cache':
+    dropcache = not (pval.upper() in [ '0', 'NO', 'FALSE' ])
+  elif pname == 'conf':
+    conffile = pval
+  elif pname == 'pool':
+    poolnm = pval
+  elif pname == 'client-list':
+    client_list = pval
+  elif pname == 'osd-list':
+    osd_list = pval
+  elif pname == 'transport':
+    if pval != 'ssh' and pval != 'local':
+      usage('--transport must be ssh or local')
+    transport_type = pval
+  else:
+    passthru_args.extend([ '--' + pname, pval ])
+
+if wltype.upper() != 'READ':
+  print('do not drop cache unless running a read test')
+  dropcache = False
+
+# set up log directory and record test parameters
+
+# with seconds and our pid so that launches in the same minute don't share it
+
+timestamp = '%s-%d' % (time.strftime('%Y-%m-%d-%H-%M-%S'), os.getpid())
+logdir = os.path.join('rados_logs', timestamp)
+os.makedirs(logdir, exist_ok=True)
+latest = os.path.join('rados_logs', 'latest')
+if os.path.islink(latest): os.unlink(latest)
+os.symlink(timestamp, latest)
+
+summary = [
+  'ceph config file: %s' % conffile,
+  'ceph pool name: %s' % poolnm,
+  'workload type: %s' % (mix and ('mix ' + mix) or wltype),
+  'object size (bytes): %s' % objsize,
+  'drop cache? %s' % dropcache,
+  'threads: %d' % threads,
+  'workers per thread process: %d' % workers,
+  'think time: %s' % thinktime,
+  'omap key-value pairs: %s' % omapkeycount,
+  'omap value size: %s' % omapvaluesize,
+  'key-value-pairs per call: %s' % omapkvpairspercall,
+  'max objects per thread: %s' % objcount,
+  'transport: %s' % transport_type ]
+with open(os.path.join(logdir, 'summary.log'), 'w') as summf:
+  for line in summary:
+    print(line)
+    summf.write(line + '\n')
+
+# check client list
+
+try:
+  with open(client_list, 'r') as clf:
+    clients = [ l.strip() for l in clf.readlines() if len(l.strip()) > 0 ]
+except IOError as e:
+  usage('could not read client list %s: %s' % (client_list, str(e)))
+if len(clients) == 0:
+  usage('no RADOS client list found')
+hosts = sorted(set(clients), key=clients.index)
+
+# ssh control sockets go in a short directory of their own, since a unix
+# socket path can't be longer than 108 bytes and the log directory can be
+
+if transport_type == 'ssh':
+  control_dir = tempfile.mkdtemp(prefix='roperf-ssh-')
+  atexit.register(shutil.rmtree, control_dir, True)
+  transport = SshTransport(control_dir)
+else:
+  transport = LocalTransport(os.path.abspath(os.path.join(logdir, 'hosts')))
+
+# run a rados CLI command against the pool, returns its exit status,
+# or NOTOK if the rados command isn't installed here
+
+radoscmd = [ 'rados', '-c', conffile, '-p', poolnm ]
+
+def run_rados(args, **kwargs):
+  try:
+    return subprocess.call(radoscmd + args, **kwargs)
+  except OSError as e:
+    print('could not run rados: %s' % str(e))
+    return NOTOK
+
+# check that pool exists and remove shared state left by previous test.
+# with --transport local there may be no cluster or rados CLI on this host,
+# so a failure here is only a warning, and rados_object_perf.py finds out
+
+if run_rados([ 'df' ]) != OK:
+  if transport_type != 'local':
+    print('ERROR: could not check pool %s status' % poolnm)
+    print('create the pool first, then run the test')
+    sys.exit(NOTOK)
+  print('WARNING: could not check pool %s status, continuing with local transport' % poolnm)
+else:
+  for shared_obj in [ 'threads_done', 'threads_ready' ]:
+    run_rados([ 'rm', shared_obj ], stderr=subprocess.DEVNULL)
+
+# open one connection per host, all hosts at once
+
+statuses = on_all_hosts(hosts, transport.connect)
+bad_hosts = [ h for (h, s) in zip(hosts, statuses) if s != OK ]
+if len(bad_hosts) > 0:
+  usage('could not connect to %s' % ', '.join(bad_hosts))
+
+# drop cache if this is a read test
+
+if dropcache:
+  print('dropping cache')
+  osd_hosts = []
+  if os.path.exists(osd_list):
+    with open(osd_list, 'r') as osdf:
+      osd_hosts = [ l.strip() for l in osdf.readlines() if len(l.strip()) > 0 ]
+  all_hosts = sorted(set(hosts + osd_hosts))
+  drop_log = os.path.join(logdir, 'rados-obj-perf.cachedrop.log')
+  def drop_cache(host):
+    transport.connect(host)
+    return transport.run(host, 'sync ; echo 3 > /proc/sys/vm/drop_caches', drop_log + '.' + host)
+  if len([ s for s in on_all_hosts(all_hosts, drop_cache) if s != OK ]) > 0:
+    usage('could not drop cache, see %s.*' % drop_log)
+
+# kill off any straggler processes on remote hosts,
+# remove results of earlier runs so they aren't collected with this one,
+# and make sure rados_object_perf.py on clients is same as we have here
+
+def prepare_host(host):
+  transport.run(host, 'killall -q rados_object_perf.py ; mkdir -p %s ; rm -f %s/rados-wl-thread-*' %
+                      (remote_dir, remote_dir),
+                os.path.join(logdir, 'rados-obj-perf.killthreads.%s' % host))
+  return transport.copy_to(host, client_files, remote_dir)
+
+statuses = on_all_hosts(hosts, prepare_host)
+bad_hosts = [ h for (h, s) in zip(hosts, statuses) if s != OK ]
+if len(bad_hosts) > 0:
+  usage('could not copy client files to %s' % ', '.join(bad_hosts))
+
+# assign threads to hosts round-robin, as rados-obj-perf.sh does,
+# and build each thread's rados_object_perf.py command
+
+thread_total = threads * workers
+host_threads = dict([ (h, []) for h in hosts ])
+for n in range(1, threads + 1):
+  padded_n = '%03d' % n
+  host = clients[(n - 1) % len(clients)]
+  first_thread_id = (n - 1) * workers + 1
+  l = [ './rados_object_perf.py', '--output-format', 'json',
+        '--response-time-file', 'rados-wl-thread-%s.rsp' % padded_n,
+        '--response-time-format', 'binary',
+        '--conf', conffile, '--pool', poolnm,
+        '--thread-id', str(first_thread_id), '--thread-total', str(thread_total) ]
+  if mix: l.extend([ '--mix', mix ])
+  else: l.extend([ '--request-type', wltype ])
+  if workers > 1: l.extend([ '--workers', str(workers) ])
+  if objsize: l.extend([ '--object-size', objsize ])
+  if objcount: l.extend([ '--object-count', objcount ])
+  if adjustthink: l.extend([ '--adjust-think-time', adjustthink ])
+  if omapkeycount: l.extend([ '--omap-key-count', omapkeycount ])
+  if omapvaluesize: l.extend([ '--omap-value-size', omapvaluesize ])
+  if omapkvpairspercall: l.extend([ '--omap-kvpairs-per-call', omapkvpairspercall ])
+  if thinktime: l.extend([ '--think-time', thinktime ])
+  l.extend(passthru_args)
+  host_threads[host].append((padded_n, ' '.join(l)))
+
+# start all threads on all hosts at once, one remote command per host
+
+launch_start = time.time()
+procs = {}
+for host in hosts:
+  if len(host_threads[host]) == 0: continue
+  procs[host] = transport.start(host, host_launch_cmd(host_threads[host]),
+                                os.path.join(logdir, 'rados-obj-perf.launch.%s' % host))
+print('all threads launched in %f sec' % (time.time() - launch_start))
+
+# wait for them to finish, report if problem
+
+worst_status = OK
+for host in procs.keys():
+  procs[host].wait()
+  out_path = os.path.join(logdir, 'rados-obj-perf.launch.%s' % host)
+  cmds = dict(host_threads[host])
+  status = parse_exit_status(out_path, list(cmds.keys()))
+  for padded_n in sorted(status.keys()):
+    s = status[padded_n]
+    if s != OK:
+      print('thread %s returns status %d from host %s for cmd: %s' %
+            (padded_n, s, host, cmds[padded_n]))
+      worst_status = s
+
+# collect thread logs and response time files, all hosts at once
+
+def collect_host(host):
+  return transport.copy_from(host, '%s/rados-wl-thread-*' % remote_dir, logdir)
+
+on_all_hosts(hosts, collect_host)
+
+# record aggregate result
+
+analyze_cmd = [ os.path.join(script_dir, 'analyze-roperf-logs.py'), '--directory', logdir ]
+analysis = subprocess.run(analyze_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+report = '\nSUMMARY\n------\n' + analysis.stdout.decode('utf-8', 'replace')
+print(report)
+with open(os.path.join(logdir, 'summary.log'), 'a') as summf:
+  summf.write(report)
+
+# clean up leftover threads and close per-host connections
+
+def finish_host(host):
+  transport.run(host, 'killall -q rados_object_perf.py || echo -n',
+                os.path.join(logdir, 'rados-obj-perf.killthreads.%s' % host))
+  return transport.disconnect(host)
+
+on_all_hosts(hosts, finish_host)
+sys.exit(worst_status)
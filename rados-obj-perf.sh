@@ -18,6 +18,7 @@ perf_obj=rados_object_perf
 poolnm=radosperftest
 wltype=cleanup
 threads=2
+workers=1
 thinktime=0.1
 adjustthink=true
 dropcache=True
@@ -29,7 +30,7 @@ NOTOK=1
 
 usage() {
   echo "ERROR: $1"
-  echo "usage: ./rados-obj-perf.sh --obj-size bytes --obj-count objects --threads count --request-type write|read|cleanup --think-time millisec --drop-cache boolean"
+  echo "usage: ./rados-obj-perf.sh --obj-size bytes --obj-count objects --threads count [ --workers per-thread-count ] --request-type write|read|cleanup --think-time millisec --drop-cache boolean"
   exit $NOTOK
 }
 
@@ -63,6 +64,9 @@ while [ -n "$1" ] ; do
     --threads)
       threads=$2
       ;;
+    --workers)
+      workers=$2
+      ;;
     --obj-count)
       objcount=$2
       ;;
@@ -117,6 +121,7 @@ echo "workload type: $wltype" ; \
 echo "object size (bytes): $objsize" ; \
 echo "drop cache? $drop_cache" ; \
 echo "threads: $threads" ; \
+echo "workers per thread process: $workers" ; \
 echo "test duration maximum: $duration" ; \
 echo "think time: $thinktime" ; \
 echo "omap key-value pairs: $omapkeycount" ; \
@@ -161,9 +166,16 @@ cleanup
 
 # make sure rados_object_perf.py on clients is same as we have here"
 
-ansible all -i $logdir/all.list -m copy -a \
-	  'src=rados_object_perf.py dest=./' \
-	> $logdir/rados-obj-perf.copy.log 2>&1 || exit $NOTOK
+for f in rados_object_perf.py roperf_stats.py roperf_data.py roperf_placement.py roperf_access.py ; do
+  ansible all -i $logdir/all.list -m copy -a \
+	  "src=$f dest=./" \
+	>> $logdir/rados-obj-perf.copy.log 2>&1 || exit $NOTOK
+done
+
+# remove response time files of earlier runs so they aren't collected with this one
+
+ansible all -i $logdir/all.list -m shell -a 'rm -f /tmp/rados-wl-thread-*.rsp' \
+	>> $logdir/rados-obj-perf.cleanup.log 2>&1 || exit $NOTOK
 
 # create a RADOS object to maintain shared state
 $radoscmd rm threads_done > /tmp/quiet 2>&1
@@ -182,7 +194,9 @@ $radoscmd rm threads_ready >> /tmp/quiet 2>&1
 #fi
 
 # start threads
+# each thread process runs $workers workers with consecutive thread IDs
 
+(( thread_total = $threads * $workers ))
 hx=0
 pids=''
 targethost=()
@@ -198,10 +212,15 @@ for padded_n in `seq -f "%03g" 1 $threads` ; do
 
   # determine rados_object_perf.py command to launch
 
-  rsptimepath="/tmp/rados-wl-thread-${padded_n}.csv"
+  rsptimepath="/tmp/rados-wl-thread-${padded_n}.rsp"
   l="ssh $host ./rados_object_perf.py --output-format json --response-time-file $rsptimepath" 
+  l="$l --response-time-format binary"
   l="$l --conf $conffile --pool $poolnm "
-  l="$l --request-type $wltype --thread-id $n --thread-total $threads"
+  (( first_thread_id = ($n - 1) * $workers + 1 ))
+  l="$l --request-type $wltype --thread-id $first_thread_id --thread-total $thread_total"
+  if [ $workers -gt 1 ] ; then
+    l="$l --workers $workers"
+  fi
   if [ -n "$objsize" ] ; then
     l="$l --object-size $objsize "
   fi
@@ -258,8 +277,8 @@ for padded_n in `seq -f "%03g" 1 $threads` ; do
   ((hx = $hx + 1))
   echo
   echo "--- $host thread $padded_n ---"
-  rsptimepath="/tmp/rados-wl-thread-${padded_n}.csv"
-  scp -q $host:$rsptimepath $logdir/
+  rsptimepath="/tmp/rados-wl-thread-${padded_n}*.rsp"
+  scp -q "$host:$rsptimepath" $logdir/
   #cat $logdir/rados-wl-thread-$padded_n.log
   if [ $hx -ge $hostcount ] ; then hx=0 ; fi
 done
@@ -8,9 +8,17 @@
 # to run multiple threads, use rados-obj-perf.sh
 #
 
-import rados, sys, time, socket, os, json
+import rados, sys, time, socket, os, json, errno, threading, asyncio, multiprocessing, queue, random, zlib
 from rados import Ioctx
 from functools import reduce
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from roperf_stats import RspTimeRecorder, LatencyHistogram, export_csv, report_percentiles, usec_per_sec
+from roperf_stats import find_knee
+from roperf_data import DataPattern, data_patterns, checksum_codes, checksum_function, fixed_pattern
+from roperf_data import object_header, object_header_size, verify_object
+from roperf_placement import pg_balanced_names, pg_object_counts
+from roperf_access import RandomAccess, access_types
 
 debug=0
 dbgstr = os.getenv('DEBUG') 
@@ -26,19 +34,9 @@ poll_timeout = 5
 key_prefix = 'key'
 omap_obj_name = 'omap_object'
 
-# must define globals at present to make them visible to call back routines,
-# FIXME: there is a better way (lambda?)
 # remember you have to use "global" statement to modify
 # these inside a subroutine.
-
-rqs_done = 0
-last_checked = 0  # save previous value to compute delta
-check_every = 0   # check every so often to see if a thread finished
-rqs_posted = 0 # increment every time an async request is posted
-measurement_over = False  # true after first thread finishes
-units_done = 0
-done_checks = 0  # how many times we check to see if other threads are done
-ioctx = None
+# per-thread state lives in a Worker object, see below
 
 # declare  command line parameters up front with defaults 
 # so they have scope 
@@ -55,183 +53,916 @@ duration = 0
 objsize = None
 objcount = None
 omap_kvpairs_per_call = None
+omap_shards = 1  # omap objects each worker spreads its keys over
 omap_key_count = None
 omap_value_size = None
+xattr_count = None  # xattrs per object for xattr-write and xattr-read
+xattr_size = None
+xattr_names = []  # built before forking, with xattr_value
+xattr_value = None
 optype = 'cleanup'
 unit = 'object'
 thread_id = ''
 threads_total = 1
+workers = 1
+processes = 1
+engine = 'thread'
+local_coordinator = None  # set in worker processes forked by --processes
 think_time_sec = 0.0
 adjusting_think_time = False
 output_json = False
 rsptime_path = None
+rsptime_format = 'csv'
 transfer_unit = 'MB'
 threads_done_fraction = 0.1
+done_check_interval = 1.0  # seconds between background threads-done checks
+done_watcher = None  # DoneWatcher for this process, if there are other threads
+access = 'sequential'
+zipf_exponent = 0.99
+hotset_obj_pct = 20.0
+hotset_rq_pct = 80.0
+random_seed = None
+cross_thread_access = False
+purge = False  # cleanup removes every object in the pool
+pg_balance = False  # choose object names that spread evenly over the pool's PGs
+pg_count = None  # pool's pg_num for --pg-balance, asked of the cluster if not given
+qdepth_steps = []  # queue depths to try with --qdepth-search
+qdepth_step_secs = 10.0
+knee_gain_pct = 10.0
+target_rate = 0.0  # open-loop requests/sec per worker, 0 means closed-loop
+cluster_target_rate = 0.0
+mix_rq_types = []     # request types in a --mix run
+mix_cum_weights = []  # and their cumulative weights
+data_pattern_name = 'fixed'
+compress_pct = 0.0
+data_pattern = None  # DataPattern that object writes come from
+verify_data = False  # stamp objects with a header when writing, check it when reading
+checksum_name = 'crc32'
+verifier = None  # ObjectVerifier for this process, with --verify
+purge_lister = None  # PurgeLister for this process, with --purge
+verify_backlog_max = 256  # reads waiting to be verified before reads slow down
+write_generation = count(1)  # generation stamped in each object header
+omap_batches = {}  # first key number -> (keys, values) of each omap-write batch
+omap_batch_cache_limit = 1 << 28  # bytes of omap-write batches to build in advance
+list_partitions = 1  # threads each list worker deals listed objects out to
+list_xattrs = True  # whether list fetches the xattrs of each object
+list_batch_size = 256  # objects handed to a list partition at a time
+list_queue_batches = 64  # batches waiting for a list partition before listing waits
+
+# weight of each request type in a --mix run, as given on the command line
+
+def mix_weights():
+  prev_cum_weights = [ 0.0 ] + mix_cum_weights[:-1]
+  return dict([ (t, cw - prev) for (t, cw, prev) in zip(mix_rq_types, mix_cum_weights, prev_cum_weights) ])
+
+
+# start writing an object's data from the data pattern pool,
+# without copying it if the python rados binding accepts that
+
+def aio_write_object(ioctx, objnm, oncomplete):
+  if verify_data:
+    return aio_write_stamped_object(ioctx, objnm, oncomplete)
+  if data_pattern.zero_copy:
+    try:
+      return ioctx.aio_write_full(objnm, data_pattern.buffer(objnm), oncomplete=oncomplete)
+    except TypeError:
+      data_pattern.needs_bytes()  # binding only takes bytes
+  return ioctx.aio_write_full(objnm, data_pattern.buffer(objnm), oncomplete=oncomplete)
+
+
+# with --verify, write the object header and then the pattern data after it
+# in one write op, so the data is still not copied to prepend the header.
+# the op must outlive the request, so release it when the write completes
+
+def aio_write_stamped_object(ioctx, objnm, oncomplete):
+  csum = data_pattern.checksum(objnm, checksum_function(checksum_name))
+  hdr = object_header(objnm, next(write_generation), data_pattern.size, checksum_name, csum)
+  op = ioctx.create_write_op()
+  op.write_full(hdr)
+  if data_pattern.zero_copy:
+    try:
+      op.write(data_pattern.buffer(objnm), object_header_size)
+    except TypeError:
+      data_pattern.needs_bytes()  # binding only takes bytes
+  if not data_pattern.zero_copy:
+    op.write(data_pattern.buffer(objnm), object_header_size)
+  def stamped_write_done(completion):
+    oncomplete(completion)
+    op.release()
+  return ioctx.aio_operate_write_op(op, objnm, oncomplete=stamped_write_done)
+
+
+# one page of an omap object's key-value pairs, requested asynchronously
+
+class OmapPage:
+
+  def __init__(self, ioctx, omap_obj, start_after, max_return):
+    self.op = ioctx.create_read_op()
+    (self.pairs, _) = ioctx.get_omap_vals(self.op, start_after, '', max_return)
+    self.ret = 0
+    self.done = threading.Event()
+    self.start_time = time.time()
+    self.end_time = None
+    ioctx.aio_operate_read_op(self.op, omap_obj, oncomplete=self.on_complete)
+
+  def on_complete(self, completion):
+    self.end_time = time.time()
+    self.ret = completion.get_return_value()
+    self.done.set()
+
+  # wait for the page to arrive, returns list of its key-value pairs.
+  # the read op is released the first time, so this can be called again
+
+  def wait(self, omap_obj):
+    if not self.done.wait(qdrain_timeout / 1000.0):
+      raise Exception('omap page of %s not read in %f sec' % (omap_obj, qdrain_timeout / 1000.0))
+    try:
+      if self.ret < 0:
+        raise Exception('omap read of %s failed: %s' % (omap_obj, os.strerror(-self.ret)))
+      return list(self.pairs)
+    finally:
+      if self.op is not None:
+        self.op.release()
+        self.op = None
+
+
+# iterate over an omap object's key-value pairs, page_size at a time.
+# each page starts after the last key of the one before it, so as soon as
+# a page arrives the next one is requested, and is on its way while the
+# caller goes through this one.  the first page is requested right away.
+# the response time of each page is recorded, for shard if given.
+# the caller must close() this to wait for the page it didn't need
+
+def omap_pager(w, omap_obj, page_size, shard=None):
+  return omap_pages(w, omap_obj, page_size, OmapPage(w.ioctx, omap_obj, '', page_size), shard)
+
+
+def omap_pages(w, omap_obj, page_size, page, shard):
+  try:
+    while page is not None:
+      # once waited for, a page that failed is not waited for again below
+      (this_page, page) = (page, None)
+      pairs = this_page.wait(omap_obj)
+      w.record_rsptime(this_page.start_time, this_page.end_time, shard=shard)
+      # an empty page, not a short one, means we've seen every key
+      if len(pairs) > 0:
+        page = OmapPage(w.ioctx, omap_obj, pairs[-1][0], page_size)
+      for kv in pairs:
+        yield kv
+  finally:
+    if page is not None:
+      page.wait(omap_obj)
+
+
+# take items from several iterators in turn until they are all used up,
+# yielding (which iterator, item)
+
+def interleave(iterators):
+  active = list(enumerate(iterators))
+  while len(active) > 0:
+    for (k, it) in list(active):
+      try:
+        yield (k, next(it))
+      except StopIteration:
+        active.remove((k, it))
+
+
+# value of an omap key: the key name repeated, separated by '.',
+# cut off at omap_value_size bytes
+
+def omap_value(omap_key_name):
+  if omap_value_size == 0:
+    return b''
+  reps = omap_value_size // (len(omap_key_name) + 1) + 1
+  return bytes(((omap_key_name + '.') * reps)[:omap_value_size], 'utf-8')
+
+
+# which of a worker's --omap-shards objects a key belongs in
+
+def omap_shard(omap_key_name):
+  if omap_shards == 1:
+    return 0
+  return zlib.crc32(omap_key_name.encode('utf-8')) % omap_shards
+
+
+# the batch of omap key-value pairs starting after key number base_key,
+# as a list of (shard, keys, values) with the keys for each shard it touches
+
+def build_omap_batch(base_key):
+  keys = [ '%s-%09d' % (key_prefix, (omap_kvpairs_per_call - k) + base_key)
+           for k in range(omap_kvpairs_per_call) ]
+  shard_keys = {}
+  for omap_key_name in keys:
+    shard_keys.setdefault(omap_shard(omap_key_name), []).append(omap_key_name)
+  return [ (shard, tuple(ks), tuple([ omap_value(omap_key_name) for omap_key_name in ks ]))
+           for (shard, ks) in sorted(shard_keys.items()) ]
+
+
+def omap_batch(base_key):
+  batch = omap_batches.get(base_key)
+  if batch is None:
+    batch = build_omap_batch(base_key)
+  return batch
+
+
+# every worker writes the same keys and values to its own omap object,
+# so the batches are built once per process, before the test starts,
+# unless they would take more than omap_batch_cache_limit bytes
+
+def build_omap_batches():
+  if omap_key_count * (omap_value_size + 16) > omap_batch_cache_limit:
+    return
+  for base_key in range(0, omap_key_count, omap_kvpairs_per_call):
+    omap_batches[base_key] = build_omap_batch(base_key)
+
+
+# build a write op that sets omap key-value pairs in one call,
+# caller must release it
+
+def build_omap_write_op(ioctx, keys, values):
+  op = ioctx.create_write_op()
+  ioctx.set_omap(op, keys, values)
+  return op
+
+
+# bounded pipeline of in-flight asynchronous RADOS requests.
+# the submitting thread blocks in await_slot() until a completion callback
+# frees a slot, so we never poll for the queue to drain.
+# completion callbacks record response time when the request actually
+# completes and save the first error so the submitting thread can raise it
+
+class RequestPipeline:
+
+  def __init__(self, qdepth, record_rsptime):
+    self.qdepth = qdepth
+    self.record_rsptime = record_rsptime
+    self.inflight = 0
+    self.posted = 0
+    self.done = 0
+    self.max_inflight_seen = 0
+    self.error = None
+    self.verify = None  # with --verify, called with (object, data) for each read
+    self.cv = threading.Condition()
+
+  # wait for a free slot, then claim it for the request about to be submitted
+
+  def await_slot(self):
+    with self.cv:
+      while self.inflight >= self.qdepth and self.error is None:
+        if not self.cv.wait(qdrain_timeout / 1000.0):
+          raise Exception('queue never drained in %f sec' % (qdrain_timeout / 1000.0))
+      if self.error is not None:
+        raise self.error
+      self.inflight += 1
+      self.posted += 1
+      self.max_inflight_seen = max(self.inflight, self.max_inflight_seen)
+      if debug & 0x2: print('max_inflight_seen = %d' % self.max_inflight_seen)
+
+  # called from a completion callback when a request finishes
+  # inputs:
+  #   call_start_time - time the request was submitted
+  #   ret - librados return code, negative errno on failure
+  #   objnm - object (or omap object) that the request was for
+  #   ignore_errnos - errno values that are not failures for this request
+  #   rq_type - request type, if not the run's request type (--mix)
+  #   shard - --omap-shards object number that the request was for
+  #   kvpairs - key-value pairs that an omap lookup returned
+
+  def complete(self, call_start_time, ret, objnm, ignore_errnos=(), rq_type=None, shard=None, kvpairs=0):
+    now = time.time()
+    with self.cv:
+      self.record_rsptime(call_start_time, now, rq_type, ret, shard, kvpairs)
+      if ret < 0 and (-ret not in ignore_errnos) and self.error is None:
+        self.error = Exception('request for %s failed: %s' % (objnm, os.strerror(-ret)))
+      self.inflight -= 1
+      self.done += 1
+      self.cv.notify()
+
+  # record the response time of a synchronous request
+  # so it is reported the same way as asynchronous ones
+
+  def record_sync(self, call_start_time, shard=None):
+    self.await_slot()
+    self.complete(call_start_time, 0, None, shard=shard)
+
+  # fail the requests in this pipeline because of an exception
+  # in a thread other than the one submitting them
+
+  def fail(self, e):
+    with self.cv:
+      if self.error is None:
+        self.error = e
+      self.cv.notify_all()
+
+  # wait for all in-flight requests to complete
+
+  def drain(self):
+    with self.cv:
+      while self.inflight > 0:
+        if not self.cv.wait(qdrain_timeout / 1000.0):
+          raise Exception('queue never drained in %f sec' % (qdrain_timeout / 1000.0))
+      if self.error is not None:
+        raise self.error
+
+  # after a failure, wait for requests still in flight without raising
+  # their errors again, so none of their callbacks runs after the ioctx
+  # is closed.  gives up after qdrain_timeout, like drain()
+
+  def quiesce(self):
+    deadline = time.time() + qdrain_timeout / 1000.0
+    with self.cv:
+      while self.inflight > 0:
+        if not self.cv.wait(max(0.0, deadline - time.time())):
+          print('ERROR: %d requests still in flight after %f sec' % (self.inflight, qdrain_timeout / 1000.0))
+          return
+
+
+# completion callbacks are built per request so they know
+# which object and start time they belong to
+
+# for writes, the return code is all we have to check
+
+def on_wr_rq_done(pipeline, objnm, call_start_time, ignore_errnos=(), rq_type=None):
+  def wr_rq_done(completion):
+    pipeline.complete(call_start_time, completion.get_return_value(), objnm, ignore_errnos, rq_type)
+  return wr_rq_done
+
+
+# for reads, we also check that data read was of expected length
+
+def on_rd_rq_done(pipeline, objnm, call_start_time, rq_type=None):
+  def rd_rq_done(completion, data_read):
+    ret = completion.get_return_value()
+    if ret >= 0 and len(data_read) != objsize:
+      ret = -errno.EIO
+    elif ret >= 0 and pipeline.verify is not None:
+      pipeline.verify(objnm, data_read)
+    pipeline.complete(call_start_time, ret, objnm, rq_type=rq_type)
+  return rd_rq_done
+
+
+# for omap and xattr write ops, the op must outlive the request, so release it here
+
+def on_omap_wr_rq_done(pipeline, objnm, call_start_time, op, rq_type=None, shard=None):
+  def omap_wr_rq_done(completion):
+    pipeline.complete(call_start_time, completion.get_return_value(), objnm,
+                      rq_type=rq_type, shard=shard)
+    op.release()
+  return omap_wr_rq_done
+
+
+# for omap-get and omap-range, check that all keys looked up were there,
+# and count the key-value pairs returned
+
+def on_omap_rd_rq_done(pipeline, objnm, call_start_time, op, pairs, expected, shard=None):
+  def omap_rd_rq_done(completion):
+    ret = completion.get_return_value()
+    kvpairs = 0
+    if ret >= 0:
+      kvpairs = len(list(pairs))
+      if kvpairs < expected:
+        ret = -errno.ENOENT
+    pipeline.complete(call_start_time, ret, objnm, shard=shard, kvpairs=kvpairs)
+    op.release()
+  return omap_rd_rq_done
+
+
+# python rados has no asynchronous way to read xattrs in one op, so
+# xattr-read does the blocking get_xattrs, one librados op returning
+# all of an object's xattrs, in a pool of qdepth threads per worker.
+# returns 0, or negative errno if an xattr is missing or the wrong size
+
+def read_xattrs(ioctx, objnm):
+  try:
+    xattrs = dict(ioctx.get_xattrs(objnm))
+  except rados.ObjectNotFound:
+    return -errno.ENOENT
+  except rados.Error:
+    return -errno.EIO
+  for name in xattr_names:
+    v = xattrs.get(name)
+    if v is None:
+      return -errno.ENODATA
+    if len(v) != xattr_size:
+      return -errno.EIO
+  return 0
+
+
+def xattr_read_rq(pipeline, ioctx, objnm, call_start_time):
+  pipeline.complete(call_start_time, read_xattrs(ioctx, objnm), objnm)
+
+
+# set all of an object's xattrs in one write op
+
+def build_xattr_write_op(ioctx):
+  op = ioctx.create_write_op()
+  for name in xattr_names:
+    op.set_xattr(name, xattr_value)
+  return op
+
+
+# coordination between worker processes forked on this host by --processes,
+# through shared memory rather than the threads_ready/threads_done objects.
+# the parent process registers all local workers at the starting line
+# with one request, posts their threads-done events, and is the only
+# process on this host that polls to see if the measurement is over
+
+class LocalCoordinator:
+
+  def __init__(self, ctx, local_thread_count):
+    self.local_thread_count = local_thread_count
+    self.ready = ctx.Value('i', 0)
+    self.go = ctx.Event()
+    self.measurement_over = ctx.Value('b', False)
+    self.done_q = ctx.Queue()
+    self.results_q = ctx.Queue()
+    self.print_lock = ctx.Lock()
+
+  # called by a worker in a child process when it reaches the starting line
+
+  def arrive_and_wait(self):
+    with self.ready.get_lock():
+      self.ready.value += 1
+    gun_timeout = (poll_timeout + 1) * starting_gun_poll_interval()
+    if not self.go.wait(gun_timeout):
+      raise Exception('starting gun did not fire within %f sec' % gun_timeout)
+
+
+# state for one logical workload thread.
+# a process can drive several of these over one cluster handle and ioctx,
+# each with its own thread ID, object names, starting-gun and threads-done
+# registration, and results, just as if each were a separate process
+
+class Worker:
+
+  def __init__(self, ioctx, thread_id):
+    self.ioctx = ioctx
+    self.thread_id = thread_id
+    self.per_thread_obj_name = '%s-%s' % (omap_obj_name, thread_id)
+    self.omap_shard_objs = [ self.per_thread_obj_name ]
+    self.shard_histograms = []  # response times of each --omap-shards object
+    if omap_shards > 1:
+      self.omap_shard_objs = [ '%s.%d' % (self.per_thread_obj_name, shard)
+                               for shard in range(0, omap_shards) ]
+      self.shard_histograms = [ LatencyHistogram() for shard in range(0, omap_shards) ]
+    qdepth = aio_qdepth
+    if optype == 'list':
+      # each list partition has one xattr fetch in flight,
+      # and its response times are kept like a shard's
+      qdepth = list_partitions
+      if list_partitions > 1:
+        self.shard_histograms = [ LatencyHistogram() for partition in range(0, list_partitions) ]
+    self.rsptime_recorder = RspTimeRecorder(worker_spool_path(thread_id), thread_id, optype)
+    self.last_rsp_time = 0.0
+    self.histograms = {}  # request type -> LatencyHistogram
+    self.pipeline = RequestPipeline(qdepth, self.record_rsptime)
+    self.sampled_rsp_times = [ 0.01 for k in range (0, 3) ]
+    self.think_time_sec = think_time_sec
+    self.measurement_over = False  # true after first thread finishes
+    self.units_done = 0
+    self.kvpairs_done = 0  # key-value pairs omap-get and omap-range lookups returned
+    self.done_checks = 0  # how many times this process checked if other threads are done
+    self.start_time = None
+    self.elapsed_time = -1.0
+    self.error = None
+    if random_seed is None:
+      self.rng = random.Random()
+    else:
+      self.rng = random.Random('%d-%s' % (random_seed, thread_id))
+    if access != 'sequential' and not optype.startswith('omap'):
+      self.object_access = object_access(thread_id)
+    self.send_interval = 0.0
+    if target_rate > 0.0:
+      self.send_interval = 1.0 / target_rate
+    self.next_send_time = None
+    self.intended_send_time = None
+    self.max_send_lag = 0.0  # how far behind schedule a request was sent
+    self.step_histogram = None  # response times in this --qdepth-search step
+    self.verified = 0  # objects checked by --verify
+    self.verify_failures = 0
+    self.verify_secs = 0.0  # time spent checking them
+    self.verify_error = None  # first verification failure
+    if verifier is not None:
+      self.pipeline.verify = self.queue_verify
+    self.qdepth_steps = []  # results of each --qdepth-search step
+
+  # with --target-rate, wait until this request's scheduled send time.
+  # requests are scheduled at fixed intervals from the first one,
+  # no matter how long earlier requests took, so the offered load
+  # does not drop when the cluster slows down (open loop)
+
+  def pace(self):
+    if self.send_interval == 0.0:
+      return
+    now = time.time()
+    if self.next_send_time is None:
+      self.next_send_time = now
+    self.intended_send_time = self.next_send_time
+    self.next_send_time += self.send_interval
+    delay = self.intended_send_time - now
+    if delay > 0.0:
+      time.sleep(delay)
+    elif -delay > self.max_send_lag:
+      self.max_send_lag = -delay
+
+  async def async_pace(self):
+    if self.send_interval == 0.0:
+      return None
+    now = time.time()
+    if self.next_send_time is None:
+      self.next_send_time = now
+    intended = self.next_send_time
+    self.next_send_time += self.send_interval
+    delay = intended - now
+    if delay > 0.0:
+      await asyncio.sleep(delay)
+    elif -delay > self.max_send_lag:
+      self.max_send_lag = -delay
+    return intended
+
+  # time to measure a request's response time from, which is its
+  # scheduled send time in open-loop mode, so that time spent waiting
+  # behind slow requests counts against the cluster
+  # (avoids coordinated omission)
+
+  def request_start_time(self):
+    if self.send_interval == 0.0:
+      return time.time()
+    return self.intended_send_time
+
+  # hand data read from an object to the verifier thread
+
+  def queue_verify(self, objnm, data):
+    verifier.submit(self, objnm, data)
+
+  # record response time of a request started at call_start_time
+  # that completed at time now with librados return code status,
+  # and for --omap-shards, which shard it was for (for list, which partition).
+  # and for omap lookups, how many key-value pairs were returned.
+  # the histogram only counts requests inside the measurement interval,
+  # same as units_done
+
+  def record_rsptime(self, call_start_time, now, rq_type=None, status=0, shard=None, kvpairs=0):
+    if rq_type is None:
+      rq_type = optype
+    self.last_rsp_time = now - call_start_time
+    self.rsptime_recorder.record(now, self.last_rsp_time, rq_type, status)
+    if (threads_total == 1) or not self.measurement_over:
+      self.kvpairs_done += kvpairs
+      h = self.histograms.get(rq_type)
+      if h is None:
+        h = LatencyHistogram()
+        self.histograms[rq_type] = h
+      h.record(self.last_rsp_time)
+      if shard is not None and len(self.shard_histograms) > 0:
+        self.shard_histograms[shard].record(self.last_rsp_time)
+    if self.step_histogram is not None:
+      self.step_histogram.record(self.last_rsp_time)
+
+
+# threads_ready and threads_done are counters: a thread appends a
+# fixed-size record when it arrives or finishes, so the count is the object
+# size divided by the record size, which one stat returns no matter how
+# many threads there are.  the starting gun and each --qdepth-search step
+# are successive barriers on threads_ready, barrier b is complete when
+# (b+1)*threads_total records are there.  the thread that completes a
+# barrier notifies the threads watching the object, and waiters only poll
+# as a fallback in case a notify is lost.
+#
+# the objects outlive a run, so thread 1 clears what an earlier run left
+# before it registers at the starting line.  it can tell they are left
+# over because in a new run no thread can be done, and threads_ready can't
+# be full, until thread 1 has registered.  other threads wait to register
+# until they see no such leftovers, so thread 1 never removes their records.
+# leftovers of a run that died before its starting gun fired can't be told
+# apart from threads registering, and with no thread 1 nothing is cleared
 
-# make a string of the specified number of bytes to write to object
+barrier_record_size = 16
+barrier_leader_id = '1'
 
-def build_data_buf(sz):
-  starting_buf = '0123456789abcdef'
-  while len(starting_buf) < sz:
-    starting_buf += starting_buf
-  return bytes(starting_buf[0:sz], 'utf-8')
+def barrier_records(thread_ids):
+  return b''.join([ bytes('%15.15s\n' % t, 'utf-8') for t in thread_ids ])
 
 
-# for reads, we check that data read was of expected length and increment rqs done
-# no race condition here because only this routine modifies rqs_done
+# count number of threads ready or done
 
-def on_rd_rq_done(completion,data_read):
-  global rqs_done
-  data_len = len(data_read)
-  assert(data_len == objsize)
-  rqs_done += 1
+def count_threads(ioctx, counter_obj):
+  try:
+    (size, _) = ioctx.stat(counter_obj)
+  except rados.ObjectNotFound:
+    return 0
+  return size // barrier_record_size
 
 
-# for writes, increment rqs done, again this is only routine touching it
+# whether the barrier objects hold records of an earlier run
 
-def on_wr_rq_done(completion):
-  global rqs_done
-  rqs_done += 1
+def barriers_left_over(ioctx):
+  return (count_threads(ioctx, threads_done_obj) > 0 or
+          count_threads(ioctx, threads_ready_obj) >= threads_total)
 
 
-# count number of threads ready or done
+# thread 1 removes threads_ready before threads_done, so that other
+# threads keep seeing leftovers until both are gone
 
-def count_threads_in_omap(omap_obj):
-  with rados.ReadOpCtx() as op:
-    omaps, ret = ioctx.get_omap_vals(op, "", "", -1)
-    ioctx.operate_read_op(op, omap_obj)
-    # can't use len(keys) because keys is a generator
-    ct = 0
-    for (k, _) in omaps:
-      if debug: print('in omap for %s: %s' % (omap_obj, k))
-      ct += 1
-    return ct
+def clear_barriers(ioctx):
+  if not barriers_left_over(ioctx):
+    return
+  if debug: print('removing barrier objects left by an earlier run')
+  for counter_obj in [ threads_ready_obj, threads_done_obj ]:
+    try:
+      ioctx.remove_object(counter_obj)
+    except rados.ObjectNotFound:
+      pass
 
 
-# have threads wait different amounts of time for lock
+# wake up threads watching a barrier object,
+# it is not an error if some of them don't acknowledge in time
 
-def backoff_lock():
-  delay=(1.0 + int(thread_id)/100.0)
-  if debug: print('starting gun lock retry in %f sec' % delay)
-  time.sleep(delay)
+def notify_watchers(ioctx, counter_obj):
+  try:
+    ioctx.notify(counter_obj, 'count changed')
+  except rados.Error as e:
+    if debug: print('notify of %s: %s' % (counter_obj, str(e)))
 
 
-# wait for all threads to arrive at starting line
+# watch a barrier object, setting event when it is notified.
+# returns None if the python rados binding doesn't support watch,
+# in which case the caller just polls
 
-def await_starting_gun():
-  if len(thread_id) == 0: return # skip this unless there are multiple processes running this test
+def watch_counter(ioctx, counter_obj, event):
+  if not hasattr(ioctx, 'watch'):
+    return None
+  try:
+    return ioctx.watch(counter_obj, lambda *args: event.set())
+  except rados.Error as e:
+    if debug: print('watch of %s: %s' % (counter_obj, str(e)))
+    return None
 
-  # if multiple threads write to the object, this is harmless
-  # just ensuring that object exists before we update its omap
 
-  thrd_id_bytes = bytes('%8s\n' % thread_id, 'utf-8')
-  ioctx.write_full(threads_ready_obj, thrd_id_bytes) # ensure object exists before writing to omap
-  ioctx.write_full(threads_done_obj,  thrd_id_bytes)  # ensure this object exists too
+# register thread IDs at the starting line and wait for all threads to arrive.
+# later barriers in the same test (--qdepth-search steps) pass barrier_num
 
-  # tell other threads that this thread has arrived at the starting gate
+def fire_starting_gun(ioctx, thread_ids, barrier_num=0):
+  target = (barrier_num + 1) * threads_total
+  sleep_delay = barrier_poll_interval()
+  gun_timeout = poll_timeout * starting_gun_poll_interval()
+  deadline = time.time() + gun_timeout
 
-  with rados.WriteOpCtx() as op:
-    ioctx.set_omap(op, (thread_id,), (b'',))
-    ioctx.operate_write_op(op, threads_ready_obj)
+  # at the starting line, get rid of an earlier run's records first
 
-  # wait until all threads are ready to run
+  if barrier_num == 0:
+    if barrier_leader_id in thread_ids:
+      clear_barriers(ioctx)
+    else:
+      while barriers_left_over(ioctx):
+        if time.time() > deadline:
+          raise Exception('thread %s did not clear barrier objects of an earlier run within %f sec' %
+                          (barrier_leader_id, gun_timeout))
+        time.sleep(sleep_delay)
 
-  poll_count=0
-  # calculate delay based on how long it takes to start up threads
-  sleep_delay = max(threads_total/10.0, 2)
-  while poll_count < poll_timeout:
-    poll_count += 1
-    threads_ready = count_threads_in_omap(threads_ready_obj)
-    if debug: print('threads_ready now %d' % threads_ready)
-    if threads_ready >= threads_total:
-      break
-    if debug: print('waiting %f sec until next thread count check' % sleep_delay)
-    time.sleep(sleep_delay)
-  if poll_count >= poll_timeout:
-     raise Exception('threads did not become ready within %d polls with interval %f' % (poll_timeout, sleep_delay))
-  if debug: print('thread %s saw starting gun fired' % thread_id)
-  time.sleep(2) # give threads time to find out that starting gun has fired
+  # tell other threads that these threads have arrived at the starting gate,
+  # the append creates the object if we're first
 
+  ioctx.append(threads_ready_obj, barrier_records(thread_ids))
+  arrived = threading.Event()
+  watch = watch_counter(ioctx, threads_ready_obj, arrived)
+  try:
+
+    # wait until all threads are ready to run,
+    # counting again after the watch is set up so no notify is missed
+
+    threads_ready = count_threads(ioctx, threads_ready_obj)
+    if threads_ready >= target:
+      notify_watchers(ioctx, threads_ready_obj)  # we may be the last to arrive
+    while threads_ready < target:
+      if debug: print('threads_ready now %d of %d' % (threads_ready, target))
+      if time.time() > deadline:
+        raise Exception('threads did not become ready within %f sec' % gun_timeout)
+      arrived.wait(sleep_delay)
+      arrived.clear()
+      threads_ready = count_threads(ioctx, threads_ready_obj)
+  finally:
+    if watch is not None:
+      watch.close()
+  if debug: print('threads %s saw starting gun fired' % ', '.join(thread_ids))
+
+
+# how long to wait for a barrier notify before counting again,
+# with some jitter so thousands of threads don't stat at once
+
+def barrier_poll_interval():
+  return max(threads_total / 1000.0, 1.0) * (1.0 + random.random() / 2.0)
+
+
+def starting_gun_poll_interval():
+  return max(threads_total/10.0, 2)
+
+
+# wait for all threads to arrive at starting line
+
+def await_starting_gun(w):
+  if local_coordinator:
+    local_coordinator.arrive_and_wait()
+    return
+  if len(w.thread_id) > 0: # skip this unless there are multiple processes running this test
+    fire_starting_gun(w.ioctx, [ w.thread_id ])
+  if done_watcher:
+    done_watcher.start_checking()
+
+
+# wait for all threads to finish step number step of a --qdepth-search.
+# every worker registers itself, even in a --processes child,
+# so the local coordinator's one-time starting gun isn't needed
+
+def await_step_barrier(w, step):
+  if len(w.thread_id) == 0: return # only 1 thread
+  fire_starting_gun(w.ioctx, [ w.thread_id ], step)
 
-# when thread is done, signal other threads to stop measuring
 
-def post_done():
-  if len(thread_id) == 0: return # skip if only 1 thread
-  with rados.WriteOpCtx() as op:
-    ioctx.set_omap(op, (thread_id,), (b'',))
-    ioctx.operate_write_op(op, threads_done_obj)
+# tell other threads that these threads are done, notifying watchers
+# once the measurement interval is over.  threads that append at about
+# the same time can all count past the threshold, so every one past it
+# notifies rather than trying to pick the one that crossed it.  watchers
+# that already know it is over have stopped watching, so the extra
+# notifies wake nobody
 
+def post_threads_done(ioctx, thread_ids):
+  ioctx.append(threads_done_obj, barrier_records(thread_ids))
+  thrds_done = count_threads(ioctx, threads_done_obj)
+  if thrds_done > threads_total * threads_done_fraction:
+    notify_watchers(ioctx, threads_done_obj)
 
-# check every so often to see if a thread has finished
-# but not too often or we'll slow down Ceph
-# we estimate how long to wait 
-# based on a metric that incorporates both objects and aggregate data processed
 
-def object_time_estimator(obj_cnt_in):
-  return  obj_cnt_in * (objsize + 1000000)
+# when thread is done, signal other threads to stop measuring
 
-def omap_time_estimator(kvpair_cnt_in):
-  return kvpair_cnt_in * (omap_value_size + 10000)
+def post_done(w):
+  if len(w.thread_id) == 0: return # skip if only 1 thread
+  if local_coordinator:
+    local_coordinator.done_q.put(w.thread_id)
+  else:
+    post_threads_done(w.ioctx, [ w.thread_id ])
 
-def objlist_time_estimator(obj_cnt_in):
-  return obj_cnt_in
 
-# see if any other threads have finished their assigned objects
+# see if enough other threads have finished their assigned objects
 
-def other_threads_done():
-    thrds_done = count_threads_in_omap(threads_done_obj)
+def other_threads_done(ioctx):
+    thrds_done = count_threads(ioctx, threads_done_obj)
     if debug:
         print('threads done = %d' % thrds_done)
     return (thrds_done > (threads_total * threads_done_fraction))
 
 
+# background thread that checks whether the measurement is over, so that
+# workers never stall their pipelines on a RADOS call to find out.
+# there is one per process, it checks every --done-check-interval seconds
+# and also whenever the thread that ends the measurement notifies it,
+# and workers just read its flag.  with --processes the parent runs it
+# and copies the flag to the local coordinator for the children.
+# it starts checking once the starting gun has fired for this process,
+# when threads_done no longer holds an earlier run's records
+
+class DoneWatcher:
+
+  def __init__(self, ioctx, coord=None):
+    self.ioctx = ioctx
+    self.coord = coord
+    self.over = False
+    self.checks = 0
+    self.stopping = False
+    self.started = threading.Event()
+    self.wakeup = threading.Event()
+    self.thread = threading.Thread(target=self.watch_for_done, daemon=True)
+    self.thread.start()
+
+  # called when the starting gun fires
+
+  def start_checking(self):
+    self.started.set()
+
+  def watch_for_done(self):
+    watch = None
+    self.started.wait()
+    try:
+      while not self.stopping:
+        # threads_done does not exist until the first thread finishes,
+        # so keep trying to watch it until that works
+        if watch is None:
+          watch = watch_counter(self.ioctx, threads_done_obj, self.wakeup)
+        self.checks += 1
+        if other_threads_done(self.ioctx):
+          self.over = True
+          if self.coord:
+            self.coord.measurement_over.value = True
+          return
+        self.wakeup.wait(done_check_interval)
+        self.wakeup.clear()
+    except rados.Error as e:
+      print('ERROR: checking if threads are done: %s' % str(e))
+    finally:
+      if watch is not None:
+        watch.close()
+
+  def stop(self):
+    self.stopping = True
+    self.started.set()
+    self.wakeup.set()
+    self.thread.join()
+
+
+# background thread that checks the header and checksum of each object
+# read with --verify, so completion callbacks only queue the data and
+# response times don't include checking it.  the time spent checking is
+# added up per worker and reported separately
+
+class ObjectVerifier:
+
+  def __init__(self):
+    self.q = queue.Queue()
+    self.backlog_cv = threading.Condition()  # signaled as the backlog shrinks
+    self.failures_printed = 0
+    self.thread = threading.Thread(target=self.verify_objects, daemon=True)
+    self.thread.start()
+
+  def submit(self, w, objnm, data):
+    self.q.put((w, objnm, data))
+
+  # called before submitting a read, so reads don't outrun verification
+  # and pile up data in memory.  submit() never blocks, because it is
+  # called from librados completion callbacks
+
+  def throttle(self):
+    with self.backlog_cv:
+      while self.q.qsize() > verify_backlog_max:
+        self.backlog_cv.wait()
+
+  # the event loop can't block, so wait in an executor thread,
+  # but only when the backlog is too big
+
+  async def async_throttle(self):
+    if self.q.qsize() > verify_backlog_max:
+      await asyncio.get_running_loop().run_in_executor(None, self.throttle)
+
+  def verify_objects(self):
+    while True:
+      (w, objnm, data) = self.q.get()
+      if w is None:
+        return
+      check_start = time.time()
+      problem = verify_object(objnm, data)
+      w.verify_secs += time.time() - check_start
+      w.verified += 1
+      if problem is not None:
+        w.verify_failures += 1
+        if w.verify_error is None:
+          w.verify_error = problem
+        if self.failures_printed < 10:
+          self.failures_printed += 1
+          print('ERROR: verify: %s' % problem)
+      self.q.task_done()
+      if self.q.qsize() <= verify_backlog_max:
+        with self.backlog_cv:
+          self.backlog_cv.notify_all()
+
+  # wait until everything read so far has been checked, then stop
+
+  def stop(self):
+    self.q.join()
+    self.q.put((None, None, None))
+    self.thread.join()
+
+
+# slow down reads if the verifier is falling behind
+
+def throttle_verify():
+  if verifier is not None:
+    verifier.throttle()
+
+
+# whether enough threads have finished for this process to stop measuring
+
+def measurement_over_flag():
+  if local_coordinator:
+    return local_coordinator.measurement_over.value
+  return done_watcher.over
+
+
 # measurement is over for this thread when
 # a specified fraction of other threads finish
 # if there is only 1 thread then this can never happen
 # think time is never adjusted if there is only one thread
 
-def check_measurement_over(start_time, time_estimator):
-  global last_checked, measurement_over, think_time_sec, units_done, done_checks
-
-  next_elapsed_time = append_rsptime( response_times, start_time )
+def check_measurement_over(w):
   if adjusting_think_time:
-    think_time_sec = adjust_think_time(units_done, sampled_rsp_times, next_elapsed_time)
-
-  #if debug & 8: print('check_meas_over: thread_id %s' % thread_id)
-  if (threads_total == 1) or not measurement_over:
-    units_done += 1
-
-    # decide if it's time to check again
-
-  if (threads_total > 1) and not measurement_over:
-    est_cost = time_estimator(units_done)
-    done_checks += 1
-    if debug: print('est cost = %d time units' % est_cost)
-    if (est_cost - last_checked) > check_every:
-      last_checked = est_cost
-      measurement_over = other_threads_done()
-    if duration_based_exit(start_time, duration):
-      measurement_over = True
-    if measurement_over: # if this call detected that it was over
-      elapsed_time = time.time() - start_time
-
-# wait for the queue size to shrink
-# we don't have a way to wait for this event
-# so we just sleep for 1 msec for now,
-# FIXME: can probably use event to block
-
-def await_q_drain():
-  global rqs_posted, max_qdepth_seen
-  max_qdepth_seen = max(rqs_posted - rqs_done, max_qdepth_seen)
-  if debug & 0x2: print('max_qdepth_seen = %d' % max_qdepth_seen)
-  rqs_posted += 1
-  timeout = qdrain_timeout
-  while (rqs_posted - rqs_done > aio_qdepth) or ((rqs_posted == objcount) and (rqs_done < objcount)):
-    time.sleep(0.001)
-    #timeout -= 1.0
-    #if timeout < 0.0:
-    #  print('ERROR: queue never drained in %f sec!' % (qdrain_timeout/1000))
-    #  sys.exit(1)
+    w.think_time_sec = adjust_think_time(w.units_done, w.sampled_rsp_times, w.last_rsp_time)
+
+  #if debug & 8: print('check_meas_over: thread_id %s' % w.thread_id)
+  if (threads_total == 1) or not w.measurement_over:
+    w.units_done += 1
+
+  if (threads_total > 1) and not w.measurement_over:
+    w.measurement_over = measurement_over_flag() or duration_based_exit(w.start_time, duration)
+    if w.measurement_over: # if this call detected that it was over
+      w.elapsed_time = time.time() - w.start_time
 
 
 # generate next object name for this thread
@@ -240,6 +971,308 @@ def next_objnm( thread_id, index ):
   return 'o%07d-%s' % (index, thread_id)
 
 
+# names of a thread's objects.  with --pg-balance, index numbers are
+# skipped where needed so that the names spread evenly over pg_count PGs,
+# and each thread's list is built once per process, when first needed
+
+balanced_names_cache = {}
+
+def thread_object_names(thread_id):
+  if not pg_balance:
+    return [ next_objnm(thread_id, j) for j in range(0, objcount) ]
+  names = balanced_names_cache.get(thread_id)
+  if names is None:
+    names = pg_balanced_names(lambda j: next_objnm(thread_id, j), objcount, pg_count)
+    balanced_names_cache[thread_id] = names
+  return names
+
+
+# name of object number j of a thread
+
+def thread_object_name(thread_id, j):
+  if not pg_balance:
+    return next_objnm(thread_id, j)
+  return thread_object_names(thread_id)[j]
+
+
+# threads whose objects a worker chooses from with random access, and how
+# it chooses among their objects, numbered thread by thread.  only the
+# chosen object's name is built, so with --cross-thread-access a process
+# doesn't hold a name for every object of --thread-total threads.
+# all processes choose the same way, so with zipf or hotset access all
+# threads agree on which objects are hot
+
+object_access_cache = {}
+
+def object_access(thread_id):
+  if cross_thread_access:
+    thread_ids = [ str(k) for k in range(1, threads_total + 1) ]
+  else:
+    thread_ids = [ thread_id ]
+  key = tuple(thread_ids)
+  if key not in object_access_cache:
+    object_access_cache[key] = (thread_ids, random_access(len(thread_ids) * objcount))
+  return object_access_cache[key]
+
+
+# chooser of n objects or keys with this run's --access
+
+def random_access(n):
+  return RandomAccess(n, access, random_seed or 0, zipf_exponent, hotset_obj_pct, hotset_rq_pct)
+
+
+# names of the objects a worker should access, one per request
+
+def object_names(w):
+  if access == 'sequential':
+    if pg_balance:
+      return iter(thread_object_names(w.thread_id))
+    return ( next_objnm(w.thread_id, j) for j in range(0, objcount) )
+  return random_object_names(w)
+
+def random_object_names(w):
+  (thread_ids, chooser) = w.object_access
+  for k in range(0, objcount):
+    obj = chooser.choose(w.rng)
+    yield thread_object_name(thread_ids[obj // objcount], obj % objcount)
+
+
+# with --purge, cleanup removes every object in the pool instead of the
+# objects this thread wrote, so leftovers of crashed runs can be cleared
+# without knowing the thread and object counts that made them.  each
+# object belongs to the thread its name hashes to, so --thread-total
+# threads split the pool between them.  one thread per process walks the
+# pool listing, as run_list() does, and deals this process's threads
+# their objects in batches through bounded queues, so the pool is listed
+# once per process and the listing never blocks an event loop
+
+class PurgeLister:
+
+  def __init__(self, ioctx, thread_ids):
+    self.ioctx = ioctx
+    self.queues = dict([ (tid, queue.Queue(list_queue_batches)) for tid in thread_ids ])
+    self.released = set()  # threads no longer taking batches
+    self.error = None
+    self.thread = threading.Thread(target=self.list_objects, daemon=True)
+    self.thread.start()
+
+  def list_objects(self):
+    batches = dict([ (tid, []) for tid in self.queues ])
+    tid = list(self.queues)[0]
+    try:
+      for o in self.ioctx.list_objects():
+        if o.key == threads_ready_obj or o.key == threads_done_obj: continue
+        if len(self.released) == len(self.queues):
+          break
+        if threads_total > 1:
+          tid = str(zlib.crc32(o.key.encode('utf-8')) % threads_total + 1)
+        batch = batches.get(tid)
+        if batch is None:
+          continue  # a thread in another process or on another host
+        batch.append(o.key)
+        if len(batch) == list_batch_size:
+          self.put(tid, batch)
+          batches[tid] = []
+    except Exception as e:
+      self.error = e
+    finally:
+      for (tid, batch) in batches.items():
+        if len(batch) > 0 and self.error is None:
+          self.put(tid, batch)
+        self.put(tid, None)
+
+  # a thread that stopped taking batches has its queue emptied
+  # and is skipped from then on, so the listing never waits for it
+
+  def put(self, tid, batch):
+    if tid not in self.released:
+      self.queues[tid].put(batch)
+
+  # list of object names for a thread, None when there are no more
+
+  def next_batch(self, tid):
+    batch = self.queues[tid].get()
+    if batch is None and self.error is not None:
+      raise self.error
+    return batch
+
+  def object_names(self, tid):
+    while True:
+      batch = self.next_batch(tid)
+      if batch is None:
+        return
+      for objnm in batch:
+        yield objnm
+
+  # called when a thread stops early, the None wakes up
+  # a wait for its next batch in an asyncio executor
+
+  def release(self, tid):
+    self.released.add(tid)
+    q = self.queues[tid]
+    try:
+      while True:
+        q.get_nowait()
+    except queue.Empty:
+      pass
+    q.put(None)
+
+  def stop(self):
+    for tid in self.queues:
+      self.release(tid)
+    self.thread.join()
+
+
+# for the asyncio engine, a thread's purge object names as an async
+# iterator shared by its request loops.  batches are waited for in the
+# worker's executor thread, and the next batch is fetched while this
+# one is removed, so the request loops don't run dry between batches
+
+class AsyncPurgeNames:
+
+  def __init__(self, w, loop, executor):
+    self.tid = w.thread_id
+    self.loop = loop
+    self.executor = executor
+    self.names = iter(())
+    self.fetch = self.fetch_batch()
+
+  def fetch_batch(self):
+    return self.loop.run_in_executor(self.executor, purge_lister.next_batch, self.tid)
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    while True:
+      objnm = next(self.names, None)
+      if objnm is not None:
+        return objnm
+      fetch = self.fetch
+      batch = await fetch
+      if batch is None:
+        raise StopAsyncIteration
+      # the first loop to wake up installs the batch, the others take from it
+      if self.fetch is fetch:
+        self.names = iter(batch)
+        self.fetch = self.fetch_batch()
+
+
+# object names for a --qdepth-search run, which is limited by time,
+# not by object count, so it goes around the objects as many times as needed
+
+def endless_object_names(w):
+  while True:
+    for objnm in object_names(w):
+      yield objnm
+
+def units_until(units, deadline):
+  for u in units:
+    if time.time() >= deadline:
+      return
+    yield u
+
+
+# with --duration, the units a worker does stop that many seconds
+# after it started, even if there are more objects or keys
+
+def units_for_duration(w, units):
+  if duration == 0:
+    return units
+  return units_until(units, w.start_time + duration)
+
+
+# request type and object name (omap-write: first key number) for each
+# request of a --mix run, objcount requests in all.  read and write
+# each take objects from their own object_names() sequence, omap-write
+# batches cycle through omap_key_count keys in the thread's omap object
+
+def mix_requests(w):
+  names = dict([ (t, object_names(w)) for t in mix_rq_types if t != 'omap-write' ])
+  base_key = 0
+  left = objcount
+  while left > 0:
+    batch = min(left, 1024)
+    for rq_type in w.rng.choices(mix_rq_types, cum_weights=mix_cum_weights, k=batch):
+      if rq_type == 'omap-write':
+        yield (rq_type, base_key)
+        base_key = (base_key + omap_kvpairs_per_call) % omap_key_count
+      else:
+        yield (rq_type, next(names[rq_type]))
+    left -= batch
+
+
+# how omap-get and omap-range choose among omap keys 1 through
+# omap_key_count, as omap-write writes them.  like objects, hot keys
+# are spread over the key names the same way in every process
+
+omap_key_access_cache = []
+
+def omap_key_access():
+  if len(omap_key_access_cache) == 0:
+    omap_key_access_cache.append(random_access(omap_key_count))
+  return omap_key_access_cache[0]
+
+
+def omap_key(key_num):
+  return '%s-%09d' % (key_prefix, key_num)
+
+
+# what each omap-get or omap-range request looks up: a list of (shard, lookup)
+# with a tuple of omap_kvpairs_per_call keys for each shard they are in
+# (omap-get), or the key to start a range of omap_kvpairs_per_call pairs
+# after and how many of those omap-write wrote (omap-range).  there are
+# enough requests to look up omap_key_count keys in all
+
+def omap_lookups(w):
+  batches = max(1, omap_key_count // omap_kvpairs_per_call)
+  if access != 'sequential':
+    chooser = omap_key_access()
+  for b in range(0, batches):
+    base_key = b * omap_kvpairs_per_call
+    if optype == 'omap-range':
+      # keys are numbered 1 through omap_key_count
+      if access == 'sequential':
+        start_num = base_key
+      else:
+        start_num = chooser.choose(w.rng) + 1
+      after_start = omap_key_count - start_num
+      yield [ (0, (omap_key(start_num), min(omap_kvpairs_per_call, after_start))) ]
+      continue
+    if access == 'sequential':
+      batch_keys = [ omap_key(base_key + k) for k in range(1, omap_kvpairs_per_call + 1) ]
+    else:
+      batch_keys = [ omap_key(chooser.choose(w.rng) + 1) for k in range(0, omap_kvpairs_per_call) ]
+    shard_keys = {}
+    for omap_key_name in batch_keys:
+      shard_keys.setdefault(omap_shard(omap_key_name), []).append(omap_key_name)
+    yield [ (shard, tuple(ks)) for (shard, ks) in sorted(shard_keys.items()) ]
+
+
+# build a read op for an omap-get or omap-range lookup,
+# returns the op, the iterator its key-value pairs will be in,
+# and how many pairs there must be.  caller must release the op
+
+def build_omap_lookup_op(ioctx, lookup):
+  op = ioctx.create_read_op()
+  if optype == 'omap-get':
+    (pairs, _) = ioctx.get_omap_vals_by_keys(op, lookup)
+    return (op, pairs, len(set(lookup)))
+  (start_after, expected) = lookup
+  (pairs, _) = ioctx.get_omap_vals(op, start_after, key_prefix + '-', omap_kvpairs_per_call)
+  return (op, pairs, expected)
+
+
+# make sure the omap object exists and has no keys yet
+
+def reset_omap_object(ioctx, omap_obj):
+  try:
+    ioctx.remove_object(omap_obj)
+  except rados.ObjectNotFound:
+    pass  # ensure object isn't there so we have fresh omap
+  ioctx.write_full(omap_obj, b'hi there')
+
+
 # adjust think time based on total threads and last response time
 # inputs:
 #   rqnum - request number
@@ -271,18 +1304,6 @@ def duration_based_exit(start_time_in, duration_in):
   return (elapsed >= duration_in)
 
 
-# append response time to a list
-# inputs:
-#   response time list
-#   start time of preceding call
-
-def append_rsptime( rsptime_list, call_start_time ):
-  now = time.time()
-  call_duration = now - call_start_time
-  rsptime_list.append( (now, call_duration) )
-  return call_duration
-
-
 # general-purpose input error handler
 
 def usage(msg):
@@ -292,20 +1313,48 @@ def usage(msg):
   print('--pool pool-name')
   print('--user username')
   print('--qdepth queue-depth (default 1)')
-  print('--duration secs (default 0 means all objects)')
+  print('--duration secs (stop sending requests after this long, default 0 means all objects)')
   print('--object-size bytes (default 4MiB)')
   print('--object-count objects (default 10)')
   print('--omap-key-count keys (default 128)')
   print('--omap-value-size bytes (default 16)')
   print('--omap-kvpairs-per-call (default 1)')
-  print('--request-type [write|read|list|omap-write|omap-read|cleanup]')
+  print('--omap-shards count (default 1, omap objects per thread, keys are spread over them by hash)')
+  print('--request-type [write|read|list|omap-write|omap-read|omap-get|omap-range|xattr-write|xattr-read|cleanup]')
+  print('--xattr-count count (default 4, xattrs per object for xattr-write and xattr-read)')
+  print('--xattr-size bytes (default 64, size of each xattr value)')
+  print('--list-partitions count (default 1, threads fetching xattrs of listed objects in parallel, the listing itself is one walk)')
+  print('--list-xattrs true|false (default true, whether list fetches xattrs of each object)')
   print('--thread-id string (default thr1)')
   print('--thread-total (default 1)')
+  print('--workers count (default 1, thread IDs starting at --thread-id)')
+  print('--processes count (default 1, fork this many processes each running --workers)')
+  print('--engine thread|asyncio (default thread)')
   print('--output-format json (default is text)')
   print('--response-time-file path')
+  print('--response-time-format csv|binary (default csv)')
   print('--transfer-unit MB|MiB (default is MB)')
   print('--adjust-think-time true|false (default false)')
   print('--threads_done_percent percentage')
+  print('--done-check-interval secs (default 1, how often each process checks if threads are done)')
+  print('--access sequential|uniform|zipf|hotset (default sequential, random access is for read and write)')
+  print('--zipf-exponent s (default 0.99)')
+  print('--hotset objects-pct:requests-pct (default 20:80)')
+  print('--seed integer (default is a different random sequence every run)')
+  print('--cross-thread-access true|false (default false)')
+  print('--purge true|false (default false, cleanup removes every object in the pool)')
+  print('--pg-balance true|false (default false, choose object names that spread evenly over PGs)')
+  print('--pg-count count (pg_num of the pool for --pg-balance, default is to ask the cluster)')
+  print('--mix type:weight,... (for example read:70,write:20,omap-write:10, instead of --request-type)')
+  print('--qdepth-search [start:]max (read or write at queue depths start, 2*start, ... max)')
+  print('--qdepth-step-secs secs (default 10, time at each --qdepth-search step)')
+  print('--knee-gain-pct pct (default 10, knee is where doubling qdepth gains less throughput than this)')
+  print('--target-rate requests/sec (open-loop rate for each worker, default 0 means closed-loop)')
+  print('--cluster-target-rate requests/sec (open-loop rate for all --thread-total threads together)')
+  print('--data-pattern fixed|random|unique (default fixed, unique gives each object different data)')
+  print('--compressibility pct (default 0, percent of random or unique data that is zeros)')
+  print('--verify true|false (default false, write a header with a checksum and check it when reading)')
+  print('--checksum crc32|crc32c|xxhash (default crc32, checksum --verify writes use)')
   sys.exit(1)
 
 
@@ -334,8 +1383,10 @@ while arg_index < len(argv):
   elif pname == 'object-count':
     objcount = int(pval)
   elif pname == 'request-type':
+    if optype == 'mix':
+      usage('use either --request-type or --mix')
     optype = pval
-    if optype == 'omap-write' or optype == 'omap-read':
+    if optype in [ 'omap-write', 'omap-read', 'omap-get', 'omap-range' ]:
       unit = 'kvpair'
       # establish defaults
       if not omap_key_count: omap_key_count = 16
@@ -345,16 +1396,35 @@ while arg_index < len(argv):
       unit = 'object'
       if not objsize: objsize = 4194304
       if not objcount: objcount = 1024
+    elif optype == 'xattr-write' or optype == 'xattr-read':
+      unit = 'attr'
+      if not objcount: objcount = 1024
+      if not xattr_count: xattr_count = 4
+      if not xattr_size: xattr_size = 64
     else:
       usage('invalid request type: %s' % pval)
   elif pname == 'thread-id':
     thread_id = pval
   elif pname == 'thread-total':
     threads_total = int(pval)
+  elif pname == 'engine':
+    if pval != 'thread' and pval != 'asyncio':
+      usage('--engine must be either thread or asyncio')
+    engine = pval
+  elif pname == 'processes':
+    processes = int(pval)
+    if processes < 1: usage('--processes must be at least 1')
+  elif pname == 'workers':
+    workers = int(pval)
+    if workers < 1: usage('--workers must be at least 1')
   elif pname == 'think-time':
     think_time_sec = float(pval)
   elif pname == 'response-time-file':
     rsptime_path = pval
+  elif pname == 'response-time-format':
+    if pval != 'csv' and pval != 'binary':
+      usage('--response-time-format must be either csv or binary')
+    rsptime_format = pval
   elif pname == 'output-format':
     if pval != 'json': usage('invalid output format')
     output_json = True
@@ -373,14 +1443,220 @@ while arg_index < len(argv):
       adjusting_think_time = False
   elif pname == 'threads-done-percent':
     threads_done_fraction = float(pval) / 100.0
+  elif pname == 'done-check-interval':
+    done_check_interval = float(pval)
+    if done_check_interval <= 0.0: usage('--done-check-interval must be greater than zero')
+  elif pname == 'duration':
+    duration = int(pval)
+    if duration < 0: usage('--duration must not be negative')
   elif pname == 'omap-key-count':
     omap_key_count = int(pval)
   elif pname == 'omap-value-size':
     omap_value_size = int(pval)
   elif pname == 'omap-kvpairs-per-call':
     omap_kvpairs_per_call = int(pval)
+  elif pname == 'omap-shards':
+    omap_shards = int(pval)
+    if omap_shards < 1: usage('--omap-shards must be at least 1')
+  elif pname == 'xattr-count':
+    xattr_count = int(pval)
+    if xattr_count < 1: usage('--xattr-count must be at least 1')
+  elif pname == 'xattr-size':
+    xattr_size = int(pval)
+    if xattr_size < 0: usage('--xattr-size must not be negative')
+  elif pname == 'list-partitions':
+    list_partitions = int(pval)
+    if list_partitions < 1: usage('--list-partitions must be at least 1')
+  elif pname == 'list-xattrs':
+    lc_pval = pval.lower()
+    if lc_pval != 'true' and lc_pval != 'false':
+      usage('list-xattrs requires boolean value true or false')
+    list_xattrs = (lc_pval == 'true')
+  elif pname == 'mix':
+    if optype != 'cleanup':
+      usage('use either --request-type or --mix')
+    optype = 'mix'
+    unit = 'request'
+    try:
+      for rq_spec in pval.split(','):
+        (rq_type, weight) = rq_spec.split(':')
+        if rq_type not in [ 'read', 'write', 'omap-write' ] or rq_type in mix_rq_types:
+          usage('--mix request types are read, write and omap-write, each at most once')
+        if float(weight) <= 0.0:
+          usage('--mix weights must be greater than zero')
+        mix_rq_types.append(rq_type)
+        mix_cum_weights.append(float(weight) + sum(mix_cum_weights[-1:]))
+    except ValueError:
+      usage('--mix takes type:weight,..., for example read:70,write:20,omap-write:10')
+  elif pname == 'qdepth-search':
+    try:
+      qd_range = [ int(qd) for qd in pval.split(':') ]
+    except ValueError:
+      usage('--qdepth-search takes [start:]max, for example 1:64')
+    if len(qd_range) == 1: qd_range.insert(0, 1)
+    if len(qd_range) != 2 or qd_range[0] < 1 or qd_range[1] < qd_range[0]:
+      usage('--qdepth-search takes [start:]max, with 1 <= start <= max')
+    qdepth_steps = []
+    qd = qd_range[0]
+    while qd < qd_range[1]:
+      qdepth_steps.append(qd)
+      qd *= 2
+    qdepth_steps.append(qd_range[1])
+  elif pname == 'qdepth-step-secs':
+    qdepth_step_secs = float(pval)
+    if qdepth_step_secs <= 0.0: usage('--qdepth-step-secs must be greater than zero')
+  elif pname == 'knee-gain-pct':
+    knee_gain_pct = float(pval)
+  elif pname == 'target-rate':
+    target_rate = float(pval)
+    if target_rate < 0.0: usage('--target-rate must not be negative')
+  elif pname == 'cluster-target-rate':
+    cluster_target_rate = float(pval)
+    if cluster_target_rate < 0.0: usage('--cluster-target-rate must not be negative')
+  elif pname == 'data-pattern':
+    if pval not in data_patterns:
+      usage('--data-pattern must be one of %s' % ', '.join(data_patterns))
+    data_pattern_name = pval
+  elif pname == 'compressibility':
+    compress_pct = float(pval)
+    if not (0.0 <= compress_pct < 100.0):
+      usage('--compressibility must be at least 0 and less than 100')
+  elif pname == 'verify':
+    lc_pval = pval.lower()
+    if lc_pval != 'true' and lc_pval != 'false':
+      usage('verify requires boolean value true or false')
+    verify_data = (lc_pval == 'true')
+  elif pname == 'checksum':
+    if pval not in checksum_codes:
+      usage('--checksum must be one of %s' % ', '.join(checksum_codes.keys()))
+    if checksum_function(pval) is None:
+      usage('--checksum %s needs the python %s module' % (pval, pval))
+    checksum_name = pval
+  elif pname == 'access':
+    if pval != 'sequential' and pval not in access_types:
+      usage('--access must be one of sequential, %s' % ', '.join(access_types))
+    access = pval
+  elif pname == 'zipf-exponent':
+    zipf_exponent = float(pval)
+    if zipf_exponent <= 0.0: usage('--zipf-exponent must be greater than zero')
+  elif pname == 'hotset':
+    try:
+      (hotset_obj_pct, hotset_rq_pct) = [ float(pct) for pct in pval.split(':') ]
+    except ValueError:
+      usage('--hotset takes objects-pct:requests-pct, for example 20:80')
+    if not (0.0 < hotset_obj_pct <= 100.0) or not (0.0 <= hotset_rq_pct <= 100.0):
+      usage('--hotset percentages must be between 0 and 100')
+  elif pname == 'seed':
+    random_seed = int(pval)
+  elif pname == 'purge':
+    lc_pval = pval.lower()
+    if lc_pval != 'true' and lc_pval != 'false':
+      usage('purge requires boolean value true or false')
+    purge = (lc_pval == 'true')
+  elif pname == 'pg-balance':
+    lc_pval = pval.lower()
+    if lc_pval != 'true' and lc_pval != 'false':
+      usage('pg-balance requires boolean value true or false')
+    pg_balance = (lc_pval == 'true')
+  elif pname == 'pg-count':
+    pg_count = int(pval)
+    if pg_count < 1: usage('--pg-count must be at least 1')
+  elif pname == 'cross-thread-access':
+    lc_pval = pval.lower()
+    if lc_pval != 'true' and lc_pval != 'false':
+      usage('cross-thread-access requires boolean value true or false')
+    cross_thread_access = (lc_pval == 'true')
   else: usage('--%s: invalid parameter name' % pname)
 
+# a mix of object and omap requests needs defaults for both
+
+if optype == 'mix':
+  if not objsize: objsize = 4194304
+  if not objcount: objcount = 1024
+  if 'omap-write' in mix_rq_types:
+    if not omap_key_count: omap_key_count = 16
+    if not omap_value_size: omap_value_size = 32
+    if not omap_kvpairs_per_call: omap_kvpairs_per_call = 1
+
+# with multiple workers in this process or its child processes,
+# each worker gets its own thread ID counting up from --thread-id,
+# and is counted as a thread in the test
+
+local_workers = workers * processes
+if local_workers > 1:
+  if len(thread_id) == 0: thread_id = '1'
+  try:
+    worker_thread_ids = [ str(int(thread_id) + k) for k in range(0, local_workers) ]
+  except ValueError:
+    usage('--thread-id must be an integer when --workers or --processes is used')
+  threads_total = max(threads_total, local_workers)
+else:
+  worker_thread_ids = [ thread_id ]
+
+if access != 'sequential' and optype not in [ 'read', 'write', 'mix', 'omap-get', 'omap-range',
+                                             'xattr-write', 'xattr-read' ]:
+  usage('--access %s is only supported for read, write, omap-get, omap-range, xattr-write, xattr-read and --mix' % access)
+if cross_thread_access:
+  if access == 'sequential':
+    usage('--cross-thread-access requires random --access')
+  if optype.startswith('omap'):
+    usage('--cross-thread-access is only for objects, omap lookups use the thread\'s own omap')
+  try:
+    int(worker_thread_ids[0])
+  except ValueError:
+    usage('--cross-thread-access requires thread IDs numbered 1 to --thread-total')
+
+if purge:
+  if optype != 'cleanup':
+    usage('--purge is only for cleanup')
+  if threads_total > 1:
+    try:
+      int(worker_thread_ids[0])
+    except ValueError:
+      usage('--purge with more than one thread requires thread IDs numbered 1 to --thread-total')
+
+if pg_balance:
+  if optype.startswith('omap') or optype == 'list':
+    usage('--pg-balance is only for requests to the threads\' own objects')
+elif pg_count is not None:
+  usage('--pg-count is only used with --pg-balance')
+
+if cluster_target_rate > 0.0:
+  if target_rate > 0.0:
+    usage('use either --target-rate or --cluster-target-rate')
+  target_rate = cluster_target_rate / threads_total
+if duration > 0 and (optype == 'cleanup' or len(qdepth_steps) > 0):
+  usage('--duration is not used with cleanup or --qdepth-search')
+if len(qdepth_steps) > 0:
+  if optype != 'read' and optype != 'write':
+    usage('--qdepth-search is only supported for read and write')
+  if target_rate > 0.0:
+    usage('--qdepth-search is closed-loop, it cannot be used with a target rate')
+  aio_qdepth = qdepth_steps[0]
+if target_rate > 0.0:
+  if optype not in [ 'write', 'read', 'omap-write', 'omap-get', 'omap-range', 'xattr-write', 'xattr-read', 'mix' ]:
+    usage('open-loop --target-rate is only supported for write, read, omap-write, omap-get, omap-range, xattr-write, xattr-read and --mix')
+  if debug & 4:
+    print('disabling think time for open-loop test')
+  adjusting_think_time = False
+  think_time_sec = 0.0
+
+if omap_shards > 1 and optype not in [ 'omap-write', 'omap-read', 'omap-get' ]:
+  usage('--omap-shards is only supported for omap-write, omap-read and omap-get')
+if (list_partitions > 1 or not list_xattrs) and optype != 'list':
+  usage('--list-partitions and --list-xattrs are only for list')
+if list_partitions > 1 and not list_xattrs:
+  usage('--list-partitions only splits up xattr fetches, so it needs --list-xattrs true')
+if (xattr_count or xattr_size is not None) and not optype.startswith('xattr'):
+  usage('--xattr-count and --xattr-size are only for xattr-write and xattr-read')
+if compress_pct > 0.0 and data_pattern_name == 'fixed':
+  usage('--compressibility needs --data-pattern random or unique')
+if verify_data:
+  if optype not in [ 'write', 'read', 'mix' ]:
+    usage('--verify is only supported for write, read and --mix')
+  if objsize < object_header_size:
+    usage('--verify needs objects of at least %d bytes for the header' % object_header_size)
+
 if threads_total == 1:
   if debug & 4:
     print('disabling think time for single-thread test')
@@ -397,22 +1673,59 @@ if not output_json:
   print('username = %s' % username)
   print('keyring at %s' % keyring_path)
   print('I/O request queue depth = %d' % aio_qdepth)
+  print('execution engine = %s' % engine)
   if unit == 'kvpair':
     print('omap key count = %d' % omap_key_count)
     print('omap value size = %d' % omap_value_size)
     if omap_kvpairs_per_call:
       print('omap key-value-pairs per call = %d' % omap_kvpairs_per_call)
+    print('omap objects per thread = %d' % omap_shards)
   else:
-    if optype == 'read' or optype == 'write':
+    if optype == 'read' or optype == 'write' or optype == 'mix':
       print('RADOS object size = %d' % objsize)
-    print('RADOS object count = %d' % objcount)
+    if optype == 'write' or optype == 'mix':
+      print('data pattern = %s' % data_pattern_name)
+      if data_pattern_name != 'fixed':
+        print('compressibility = %g%%' % compress_pct)
+    if verify_data:
+      print('verify object data with %s checksum' % checksum_name)
+    if purge:
+      print('purge every object in the pool')
+    else:
+      print('RADOS object count = %d' % objcount)
+    if pg_balance:
+      print('object names spread evenly over PGs')
+    if unit == 'attr':
+      print('xattrs per object = %d' % xattr_count)
+      print('xattr value size = %d' % xattr_size)
+    if 'omap-write' in mix_rq_types:
+      print('omap key count = %d' % omap_key_count)
+      print('omap value size = %d' % omap_value_size)
+      print('omap key-value-pairs per call = %d' % omap_kvpairs_per_call)
   print('request type = %s' % optype)
+  if optype == 'mix':
+    print('request mix = %s' % ', '.join([ '%s:%g' % (t, wt) for (t, wt) in mix_weights().items() ]))
+  if access != 'sequential':
+    print('object access = %s' % access)
+    if access == 'zipf':
+      print('zipf exponent = %f' % zipf_exponent)
+    elif access == 'hotset':
+      print('hot set = %g%% of objects get %g%% of requests' % (hotset_obj_pct, hotset_rq_pct))
+    if random_seed is not None:
+      print('random seed = %d' % random_seed)
+    print('cross-thread access? %s' % cross_thread_access)
   if threads_total > 1:
-    print('thread_id = %s' % thread_id)
+    print('thread_id = %s' % ', '.join(worker_thread_ids))
     print('total threads in test = %d' % threads_total)
     print('threads-done percent: %f' % (threads_done_fraction * 100.0))
+    print('threads-done check interval (sec) = %f' % done_check_interval)
     print('think time (sec) = %f' % think_time_sec)
     print('adjust think time? %s' % adjusting_think_time)
+  if target_rate > 0.0:
+    print('open-loop target rate per worker = %f requests/sec' % target_rate)
+  if len(qdepth_steps) > 0:
+    print('queue depth search steps = %s, %f sec each' % (
+          ', '.join([ str(qd) for qd in qdepth_steps ]), qdepth_step_secs))
   print('transfer unit: %s' % transfer_unit)
 else:
   json_obj = {}
@@ -422,23 +1735,64 @@ else:
   params['user'] = username
   params['keyring'] = keyring_path
   params['qdepth'] = aio_qdepth
+  params['engine'] = engine
   if unit == 'kvpair':
     params['omap_key_count'] = omap_key_count
     params['omap_value_size'] = omap_value_size
     if omap_kvpairs_per_call:
       params['omap_kvpairs_per_call'] = omap_kvpairs_per_call
-    # check every 1% of time points
-    check_every = omap_time_estimator(omap_key_count) / 100
+    params['omap_shards'] = omap_shards
   else:
-    if optype == 'read' or optype == 'write':
+    if optype == 'read' or optype == 'write' or optype == 'mix':
       params['obj_size'] = objsize
+    if optype == 'write' or optype == 'mix':
+      params['data_pattern'] = data_pattern_name
+      params['compress_pct'] = compress_pct
+    params['verify'] = verify_data
+    if verify_data:
+      params['checksum'] = checksum_name
     params['obj_count'] = objcount
-    check_every = object_time_estimator(objcount) / 100
+    if purge:
+      params['purge'] = purge
+    params['pg_balance'] = pg_balance
+    if unit == 'attr':
+      params['xattr_count'] = xattr_count
+      params['xattr_size'] = xattr_size
+    if optype == 'list':
+      params['list_partitions'] = list_partitions
+      params['list_xattrs'] = list_xattrs
+    if 'omap-write' in mix_rq_types:
+      params['omap_key_count'] = omap_key_count
+      params['omap_value_size'] = omap_value_size
+      params['omap_kvpairs_per_call'] = omap_kvpairs_per_call
+    if optype == 'mix':
+      params['mix'] = mix_weights()
   params['rq_type'] = optype
   params['thread_id'] = thread_id
+  if access != 'sequential':
+    params['access'] = access
+    if access == 'zipf':
+      params['zipf_exponent'] = zipf_exponent
+    elif access == 'hotset':
+      params['hotset_obj_pct'] = hotset_obj_pct
+      params['hotset_rq_pct'] = hotset_rq_pct
+    params['seed'] = random_seed
+    params['cross_thread_access'] = cross_thread_access
+  if rsptime_path:
+    params['rsptime_format'] = rsptime_format
   params['total_threads'] = threads_total
+  params['workers'] = workers
+  params['processes'] = processes
   params['threads_done_percent'] = threads_done_fraction * 100.0
+  params['done_check_interval'] = done_check_interval
+  params['duration'] = duration
   params['think_time'] = think_time_sec
+  if target_rate > 0.0:
+    params['target_rate'] = target_rate
+  if len(qdepth_steps) > 0:
+    params['qdepth_steps'] = qdepth_steps
+    params['qdepth_step_secs'] = qdepth_step_secs
+    params['knee_gain_pct'] = knee_gain_pct
   params['adjust_think_time'] = adjusting_think_time
   params['transfer-unit'] = transfer_unit
   params['hostname'] = hostname
@@ -447,196 +1801,755 @@ else:
 if threads_done_fraction <= 0.0 or threads_done_fraction >= 1.0:
   usage('threads-done-percent must be a number in between 0 and 100')
 if optype.startswith('omap'):
-  if objcount > 0:
+  if objcount:
     usage('only define objcount for a non-omap test')
-  if objsize > 0:
+  if objsize:
     usage('only define objsize for a non-omap test')
-elif omap_kvpairs_per_call is not None:
+elif optype != 'mix' and omap_kvpairs_per_call is not None:
   if omap_kvpairs_per_call > 0:
     usage('only define omap-kvpairs-per-call for an omap test')
   if omap_key_count:
     usage('only define omap-key-count for an omap test')
   if omap_value_size:
     usage('only define omap-value-size for an omap test')
-max_qdepth_seen = 0
-if debug: print('check_every %d time units' % check_every)
-response_times = []
-sampled_rsp_times = [ 0.01 for k in range (0, 3) ]
-per_thread_obj_name = '%s-%s' % (omap_obj_name, thread_id)
 
-# if you add this to ceph.conf file, 
-# then you don't need to specify keyring in Rados constructor
-#   keyring = /root/ben/ceph.client.admin.keyring
-# alternatively don't use cephx
 
-with rados.Rados(conffile=ceph_conf_file, conf=dict(keyring=keyring_path)) as cluster:
-    #print(cluster.get_fsid())
-    pools = cluster.list_pools()
-    if not pools.__contains__(mypool):
-      cluster.create_pool(mypool) # FIXME: race condition if multiple threads
-      print('created pool ' + mypool)
-    ioctx = cluster.open_ioctx(mypool)
+# --qdepth-search: hold each queue depth in turn for qdepth_step_secs,
+# with all threads starting each step together, and save throughput
+# and response time percentiles of each step
+
+def run_qdepth_search(w):
+  ioctx = w.ioctx
+  pipeline = w.pipeline
+  names = endless_object_names(w)
+  for (step, step_qdepth) in enumerate(qdepth_steps):
+    if step > 0:
+      await_step_barrier(w, step)
+    pipeline.qdepth = step_qdepth
+    w.step_histogram = LatencyHistogram()
+    step_start = time.time()
+    for objnm in units_until(names, step_start + qdepth_step_secs):
+      throttle_verify()
+      pipeline.await_slot()
+      call_start_time = time.time()
+      if optype == 'write':
+        aio_write_object(ioctx, objnm, on_wr_rq_done(pipeline, objnm, call_start_time))
+      else:
+        ioctx.aio_read(objnm, objsize, 0,
+                       oncomplete=on_rd_rq_done(pipeline, objnm, call_start_time))
+      check_measurement_over(w)
+    pipeline.drain()
+    save_qdepth_step(w, step_qdepth, time.time() - step_start)
+
+
+# requests completed during a --qdepth-search step, including the
+# ones drained at the end of it, count toward that step's throughput
+
+def save_qdepth_step(w, step_qdepth, step_elapsed):
+  h = w.step_histogram
+  w.step_histogram = None
+  w.qdepth_steps.append({ 'qdepth': step_qdepth,
+                          'elapsed': step_elapsed,
+                          'units_done': h.total,
+                          'throughput': h.total / step_elapsed,
+                          'latency': h.to_dict() })
+
+
+# list partition thread: fetch the xattrs of each object in the
+# batches of object names dealt to it.  after a failure it keeps taking
+# batches so the listing thread never waits on it, until None says
+# the listing is over
+
+def list_partition(w, partition, batches):
+  failed = False
+  while True:
+    batch = batches.get()
+    if batch is None:
+      return
+    if failed:
+      continue
+    try:
+      for objnm in batch:
+        call_start_time = time.time()
+        for (a, v) in w.ioctx.get_xattrs(objnm):
+          if debug: print('%s: %s = %s' % (objnm, a, str(v)))
+        w.pipeline.record_sync(call_start_time, partition)
+    except Exception as e:
+      failed = True
+      w.pipeline.fail(e)
+
+
+# list up to objcount objects in the pool.  python rados can only walk
+# the listing in order, so this thread does that and deals each object
+# out by a hash of its name to one of --list-partitions threads, which
+# fetch xattrs in parallel.  objects go out in batches so the listing
+# doesn't pay for a queue operation per object.  without xattrs, the
+# response time of an object is how long the listing took to return it
+
+def run_list(w):
+  pipeline = w.pipeline
+  queues = []
+  partition_threads = []
+  if list_xattrs:
+    queues = [ queue.Queue(list_queue_batches) for partition in range(0, list_partitions) ]
+    partition_threads = [ threading.Thread(target=list_partition, args=(w, partition, q), daemon=True)
+                          for (partition, q) in enumerate(queues) ]
+    for t in partition_threads:
+      t.start()
+  batches = [ [] for q in queues ]
+  listed = 0
+  try:
+    call_start_time = time.time()
+    for o in w.ioctx.list_objects():
+      if o.key == threads_ready_obj or o.key == threads_done_obj: continue
+      if listed >= objcount or pipeline.error is not None or duration_based_exit(w.start_time, duration):
+        break
+      if w.think_time_sec: time.sleep(w.think_time_sec)
+      if debug: print(o.key)
+      listed += 1
+      if list_xattrs:
+        partition = zlib.crc32(o.key.encode('utf-8')) % list_partitions
+        batch = batches[partition]
+        batch.append(o.key)
+        if len(batch) == list_batch_size:
+          queues[partition].put(batch)
+          batches[partition] = []
+      else:
+        pipeline.record_sync(call_start_time)
+        call_start_time = time.time()
+      check_measurement_over(w)
+  finally:
+    for (partition, q) in enumerate(queues):
+      if len(batches[partition]) > 0:
+        q.put(batches[partition])
+      q.put(None)
+    for t in partition_threads:
+      t.join()
+  if pipeline.error is not None:
+    raise pipeline.error
+
+
+# run the requested workload for one worker,
+# returning when all of its objects or key-value pairs have been processed
+
+def run_workload(w):
+    ioctx = w.ioctx
+    pipeline = w.pipeline
+    per_thread_obj_name = w.per_thread_obj_name
 
     # wait until all threads are ready to run
 
-    await_starting_gun()
+    await_starting_gun(w)
 
     # do the workload
 
-    start_time = time.time()
-    elapsed_time = -1.0
+    w.start_time = time.time()
+
+    if len(qdepth_steps) > 0:
+      run_qdepth_search(w)
 
-    if optype == 'write':
-      bigbuf = build_data_buf(objsize)
-      for j in range(0,objcount):
-        objnm = next_objnm(thread_id, j)
+    elif optype == 'write':
+      for objnm in units_for_duration(w, object_names(w)):
         if debug & 1: print('creating %s' % objnm)
-        if think_time_sec > 0.0: time.sleep(think_time_sec)
-        call_start_time = time.time()
-        ioctx.aio_write_full(objnm, bigbuf, oncomplete=on_wr_rq_done)
-        await_q_drain()
-        check_measurement_over(call_start_time, object_time_estimator)
+        if w.think_time_sec > 0.0: time.sleep(w.think_time_sec)
+        w.pace()
+        pipeline.await_slot()
+        call_start_time = w.request_start_time()
+        aio_write_object(ioctx, objnm, on_wr_rq_done(pipeline, objnm, call_start_time))
+        check_measurement_over(w)
         #if measurement_over: break
-            
+      pipeline.drain()
+
     elif optype == 'read':
-      for j in range(0,objcount):
-        objnm = next_objnm(thread_id, j)
-        if think_time_sec > 0.0: time.sleep(think_time_sec)
-        call_start_time = time.time()
-        ioctx.aio_read(objnm, objsize, 0, oncomplete=on_rd_rq_done)
-        next_elapsed_time = append_rsptime( response_times, call_start_time )
-        await_q_drain()
-        check_measurement_over(call_start_time, object_time_estimator)
+      for objnm in units_for_duration(w, object_names(w)):
+        if w.think_time_sec > 0.0: time.sleep(w.think_time_sec)
+        w.pace()
+        throttle_verify()
+        pipeline.await_slot()
+        call_start_time = w.request_start_time()
+        ioctx.aio_read(objnm, objsize, 0,
+                       oncomplete=on_rd_rq_done(pipeline, objnm, call_start_time))
+        check_measurement_over(w)
         #if measurement_over: break
+      pipeline.drain()
 
     elif optype == 'list':
       if debug & 32: print('stats: ' + str(ioctx.get_stats()))
-      for o in ioctx.list_objects():
-        if think_time_sec: time.sleep(think_time_sec)
-        if o.key == threads_ready_obj or o.key == threads_done_obj: continue
-        if debug: print(o.key)
-        units_done += 1
-        call_start_time = time.time()
-        for a in ioctx.get_xattrs(o.key):
-           if debug: print(a)
-           v = ioctx.get_xattr(o.key, a)
-           print('  %s =  %s' % (a, str(v)))
-        if units_done > objcount:
-          break
-        check_measurement_over(call_start_time, objlist_time_estimator)
-        #if measurement_over: break
+      run_list(w)
 
     elif optype == 'omap-write':
-      try:
-        ioctx.remove_object(per_thread_obj_name)
-      except rados.ObjectNotFound:
-        pass  # ensure object isn't there so we have fresh omap
-      ioctx.write_full(per_thread_obj_name, 'hi there')
+      for omap_obj in w.omap_shard_objs:
+        reset_omap_object(ioctx, omap_obj)
       base_key = 0
-      value = b''
-      while base_key < omap_key_count:
-        if think_time_sec: time.sleep(think_time_sec)
-        call_start_time = time.time()
-        with rados.WriteOpCtx() as op:
-          for k in range(omap_kvpairs_per_call):
-            omap_key_name = '%s-%09d' % (key_prefix, (omap_kvpairs_per_call - k) + base_key)
-            if omap_value_size > 0:
-              v = omap_key_name
-              while len(v) < omap_value_size: v = v + '.' + v
-              value = v[:omap_value_size]
-            # syntax weirdometer alert
-            ioctx.set_omap(op, (omap_key_name,), (value,))
-          ioctx.operate_write_op(op, per_thread_obj_name)
+      while base_key < omap_key_count and not duration_based_exit(w.start_time, duration):
+        if w.think_time_sec: time.sleep(w.think_time_sec)
+        w.pace()
+        # with --omap-shards, a batch is one request per shard it touches,
+        # all in flight at once if qdepth allows
+        for (shard, keys, values) in omap_batch(base_key):
+          pipeline.await_slot()
+          call_start_time = w.request_start_time()
+          op = build_omap_write_op(ioctx, keys, values)
+          omap_obj = w.omap_shard_objs[shard]
+          ioctx.aio_operate_write_op(op, omap_obj,
+              oncomplete=on_omap_wr_rq_done(pipeline, omap_obj, call_start_time, op, shard=shard))
         base_key += omap_kvpairs_per_call
-        check_measurement_over(call_start_time, omap_time_estimator)
+        check_measurement_over(w)
         #if measurement_over: break
+      pipeline.drain()
 
     elif optype == 'omap-read':
-      ioctx.read(per_thread_obj_name)
+      for omap_obj in w.omap_shard_objs:
+        ioctx.read(omap_obj)
       keycount = 0
-      with rados.ReadOpCtx() as op:
-        last_key=''
-        while True:
-          iter, ret = ioctx.get_omap_vals(op, last_key, "", omap_kvpairs_per_call)
-          assert(ret == 0)
-          ioctx.operate_read_op(op, per_thread_obj_name)
-          pairs_in_iter = 0
-          for (k,v) in list(iter):
-            call_start_time = time.time()
-            # count omap keys as objects for throughput calculation
-            keycount += 1
-            if debug: print('%s, %s' % (k, str(v)))
-            if k < last_key:
-              print('ERROR: key %s < last key %s' % (k, last_key))
-            last_key = k
-            pairs_in_iter += 1
-            check_measurement_over(call_start_time, omap_time_estimator)
-            if keycount >= omap_key_count:
-              break
-            #if measurement_over: break
-          if keycount >= omap_key_count:
-            break
-          assert(pairs_in_iter <= omap_kvpairs_per_call)
-          if (pairs_in_iter == 0): # if we reached end of all key-value pairs
+      last_keys = [ '' for omap_obj in w.omap_shard_objs ]
+
+      # with --omap-shards, take pairs from each shard in turn
+      # so every shard has a page on the way
+
+      pagers = [ omap_pager(w, omap_obj, omap_kvpairs_per_call, shard)
+                 for (shard, omap_obj) in enumerate(w.omap_shard_objs) ]
+      try:
+        for (shard, (k,v)) in interleave(pagers):
+          # count omap keys as objects for throughput calculation
+          keycount += 1
+          if debug: print('%s, %s' % (k, str(v)))
+          if k < last_keys[shard]:
+            print('ERROR: key %s < last key %s' % (k, last_keys[shard]))
+          last_keys[shard] = k
+          check_measurement_over(w)
+          if keycount >= omap_key_count or duration_based_exit(w.start_time, duration):
             break
-        if keycount < omap_key_count:
-          usage('must first write an omap key list at least as long as %d keys' % omap_key_count)
+      finally:
+        for pairs in pagers:
+          pairs.close()
+      if keycount < omap_key_count and not duration_based_exit(w.start_time, duration):
+        raise Exception('must first write an omap key list at least as long as %d keys' % omap_key_count)
+
+    elif optype == 'omap-get' or optype == 'omap-range':
+      for lookups in units_for_duration(w, omap_lookups(w)):
+        if w.think_time_sec: time.sleep(w.think_time_sec)
+        w.pace()
+        for (shard, lookup) in lookups:
+          pipeline.await_slot()
+          call_start_time = w.request_start_time()
+          (op, pairs, expected) = build_omap_lookup_op(ioctx, lookup)
+          omap_obj = w.omap_shard_objs[shard]
+          ioctx.aio_operate_read_op(op, omap_obj,
+              oncomplete=on_omap_rd_rq_done(pipeline, omap_obj, call_start_time, op, pairs, expected, shard))
+        check_measurement_over(w)
+      pipeline.drain()
+
+    elif optype == 'xattr-write':
+      for objnm in units_for_duration(w, object_names(w)):
+        if w.think_time_sec > 0.0: time.sleep(w.think_time_sec)
+        w.pace()
+        pipeline.await_slot()
+        call_start_time = w.request_start_time()
+        op = build_xattr_write_op(ioctx)
+        ioctx.aio_operate_write_op(op, objnm,
+            oncomplete=on_omap_wr_rq_done(pipeline, objnm, call_start_time, op))
+        check_measurement_over(w)
+      pipeline.drain()
+
+    elif optype == 'xattr-read':
+      with ThreadPoolExecutor(max_workers=aio_qdepth) as executor:
+        for objnm in units_for_duration(w, object_names(w)):
+          if w.think_time_sec > 0.0: time.sleep(w.think_time_sec)
+          w.pace()
+          pipeline.await_slot()
+          call_start_time = w.request_start_time()
+          executor.submit(xattr_read_rq, pipeline, ioctx, objnm, call_start_time)
+          check_measurement_over(w)
+        pipeline.drain()
+
+    elif optype == 'mix':
+      if 'omap-write' in mix_rq_types:
+        reset_omap_object(ioctx, per_thread_obj_name)
+      for (rq_type, u) in units_for_duration(w, mix_requests(w)):
+        if w.think_time_sec > 0.0: time.sleep(w.think_time_sec)
+        w.pace()
+        throttle_verify()
+        pipeline.await_slot()
+        call_start_time = w.request_start_time()
+        if rq_type == 'read':
+          ioctx.aio_read(u, objsize, 0,
+                         oncomplete=on_rd_rq_done(pipeline, u, call_start_time, rq_type))
+        elif rq_type == 'write':
+          aio_write_object(ioctx, u, on_wr_rq_done(pipeline, u, call_start_time, (), rq_type))
+        else:
+          (_, keys, values) = omap_batch(u)[0]
+          op = build_omap_write_op(ioctx, keys, values)
+          ioctx.aio_operate_write_op(op, per_thread_obj_name,
+              oncomplete=on_omap_wr_rq_done(pipeline, per_thread_obj_name, call_start_time, op, rq_type))
+        check_measurement_over(w)
+      pipeline.drain()
 
     elif optype == 'cleanup':
-      for j in range(0,objcount):
-        objnm = next_objnm(thread_id, j)
+      if purge:
+        names = purge_lister.object_names(w.thread_id)
+      else:
+        names = object_names(w)
+      for objnm in names:
+        pipeline.await_slot()
         call_start_time = time.time()
-        try:
-          ioctx.remove_object(objnm)
-        except rados.ObjectNotFound as e:
-          pass
-        append_rsptime( response_times, call_start_time )
+        # object may already be gone, that is not an error here
+        ioctx.aio_remove(objnm,
+            oncomplete=on_wr_rq_done(pipeline, objnm, call_start_time, (errno.ENOENT,)))
         # dont want to do check_measurement_over when cleaning up: 
-        units_done += 1
+        w.units_done += 1
+      pipeline.drain()
 
     else:
        usage('should have parsed operation type by now')
 
     # let other threads know that you are done
 
-    post_done()
-    ioctx.close()
-
-    # measure throughput
+    post_done(w)
 
-    if elapsed_time < 0.0:
+    if w.elapsed_time < 0.0:
       # for some workload types, 
       # end time is when enough threads exit
       # for cleanup it's not
-      elapsed_time = time.time() - start_time
+      w.elapsed_time = time.time() - w.start_time
+
+
+# asyncio execution engine
+# each librados request is wrapped in a future on the event loop,
+# resolved from the librados completion callback via call_soon_threadsafe.
+# every worker runs qdepth coroutines, so one thread can keep
+# thousands of requests in flight without shared request counters
+
+def finish_future(fut, ret, data):
+  if not fut.done():
+    fut.set_result((ret, data))
+
+
+# returns a future and a librados completion callback that resolves it
+# with (return code, data read), read callbacks pass data, others don't
+
+def completion_future(loop):
+  fut = loop.create_future()
+  def on_complete(completion, data_read=None):
+    loop.call_soon_threadsafe(finish_future, fut, completion.get_return_value(), data_read)
+  return (fut, on_complete)
+
+
+# raise an exception if an awaited request failed
+
+def check_async_ret(ret, objnm, ignore_errnos=()):
+  if ret < 0 and (-ret not in ignore_errnos):
+    raise Exception('request for %s failed: %s' % (objnm, os.strerror(-ret)))
+
+
+async def async_write_full(loop, ioctx, objnm):
+  (fut, on_complete) = completion_future(loop)
+  aio_write_object(ioctx, objnm, on_complete)
+  (ret, _) = await fut
+  check_async_ret(ret, objnm)
+
+
+async def async_read(loop, ioctx, objnm, length):
+  (fut, on_complete) = completion_future(loop)
+  ioctx.aio_read(objnm, length, 0, oncomplete=on_complete)
+  (ret, data_read) = await fut
+  if ret >= 0 and len(data_read) != length:
+    ret = -errno.EIO
+  check_async_ret(ret, objnm)
+  return data_read
+
+
+async def async_remove(loop, ioctx, objnm, ignore_errnos=()):
+  (fut, on_complete) = completion_future(loop)
+  ioctx.aio_remove(objnm, oncomplete=on_complete)
+  (ret, _) = await fut
+  check_async_ret(ret, objnm, ignore_errnos)
+
+
+# returns the number of key-value pairs read
+
+async def async_operate_read_op(loop, ioctx, op, objnm, pairs, expected):
+  (fut, on_complete) = completion_future(loop)
+  kvpairs = 0
+  try:
+    ioctx.aio_operate_read_op(op, objnm, oncomplete=on_complete)
+    (ret, _) = await fut
+    if ret >= 0:
+      kvpairs = len(list(pairs))
+      if kvpairs < expected:
+        ret = -errno.ENOENT
+  finally:
+    op.release()
+  check_async_ret(ret, objnm)
+  return kvpairs
+
+
+async def async_read_xattrs(loop, executor, ioctx, objnm):
+  ret = await loop.run_in_executor(executor, read_xattrs, ioctx, objnm)
+  check_async_ret(ret, objnm)
+
+
+async def async_operate_write_op(loop, ioctx, op, objnm):
+  (fut, on_complete) = completion_future(loop)
+  try:
+    ioctx.aio_operate_write_op(op, objnm, oncomplete=on_complete)
+    (ret, _) = await fut
+  finally:
+    op.release()
+  check_async_ret(ret, objnm)
+
+
+# with --omap-shards, the requests of one omap batch or lookup go to
+# their shards at the same time.  each is timed from the batch's start
+# and recorded for its shard as it completes
+
+async def async_omap_write_shard(w, loop, rq_type, call_start_time, shard, keys, values):
+  op = build_omap_write_op(w.ioctx, keys, values)
+  await async_operate_write_op(loop, w.ioctx, op, w.omap_shard_objs[shard])
+  w.record_rsptime(call_start_time, time.time(), rq_type, shard=shard)
+
+
+async def async_omap_lookup_shard(w, loop, rq_type, call_start_time, shard, lookup):
+  (op, pairs, expected) = build_omap_lookup_op(w.ioctx, lookup)
+  kvpairs = await async_operate_read_op(loop, w.ioctx, op, w.omap_shard_objs[shard], pairs, expected)
+  w.record_rsptime(call_start_time, time.time(), rq_type, shard=shard, kvpairs=kvpairs)
+
+
+# await all shard requests of a batch, even if one fails,
+# so none is still in flight when the failure is raised
+
+async def gather_shard_requests(shard_requests):
+  results = await asyncio.gather(*shard_requests, return_exceptions=True)
+  for r in results:
+    if isinstance(r, Exception):
+      raise r
+  return results
+
+
+# one coroutine's share of a worker's requests,
+# units is an iterator shared by all of the worker's coroutines
+# so each object or omap batch is done exactly once.
+# units are object names, or the first key number of an omap batch,
+# with --mix they are (request type, object name or key number).
+# xattr-read runs its blocking reads in xattr_executor
+
+async def async_request_loop(w, loop, units, xattr_executor=None):
+  ioctx = w.ioctx
+  async for j in units:
+    if w.think_time_sec > 0.0: await asyncio.sleep(w.think_time_sec)
+    send_time = await w.async_pace()
+    rq_type = optype
+    if optype == 'mix':
+      (rq_type, j) = j
+    if rq_type == 'read' and verifier is not None:
+      await verifier.async_throttle()
+    call_start_time = time.time()
+    if send_time is not None:
+      call_start_time = send_time
+    if rq_type == 'write':
+      await async_write_full(loop, ioctx, j)
+    elif rq_type == 'read':
+      data_read = await async_read(loop, ioctx, j, objsize)
+      if verifier is not None:
+        w.queue_verify(j, data_read)
+    elif rq_type == 'cleanup':
+      # object may already be gone, that is not an error here
+      await async_remove(loop, ioctx, j, (errno.ENOENT,))
+    elif rq_type == 'xattr-write':
+      await async_operate_write_op(loop, ioctx, build_xattr_write_op(ioctx), j)
+    elif rq_type == 'xattr-read':
+      await async_read_xattrs(loop, xattr_executor, ioctx, j)
+    elif rq_type == 'omap-write':
+      # with --omap-shards, one request per shard the batch touches, all at once
+      await gather_shard_requests([ async_omap_write_shard(w, loop, rq_type, call_start_time,
+                                                           shard, keys, values)
+                                    for (shard, keys, values) in omap_batch(j) ])
+    elif rq_type == 'omap-get' or rq_type == 'omap-range':
+      await gather_shard_requests([ async_omap_lookup_shard(w, loop, rq_type, call_start_time,
+                                                            shard, lookup)
+                                    for (shard, lookup) in j ])
+    if not rq_type.startswith('omap'):
+      w.record_rsptime(call_start_time, time.time(), rq_type)
+    if optype == 'cleanup':
+      # dont want to do check_measurement_over when cleaning up: 
+      w.units_done += 1
+    else:
+      check_measurement_over(w)
+
+
+# units shared by request loops, from an iterator or an async iterator,
+# that end once one of the loops has failed
+
+class SharedUnits:
+
+  def __init__(self, units, failures):
+    self.units = units
+    self.failures = failures
+    self.is_async = hasattr(units, '__anext__')
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    if len(self.failures) > 0:
+      raise StopAsyncIteration
+    if self.is_async:
+      return await self.units.__anext__()
+    try:
+      return next(self.units)
+    except StopIteration:
+      raise StopAsyncIteration
+
+
+# run qdepth request loops sharing units.  if a request fails, the other
+# loops stop taking units, and every loop is awaited before the failure
+# is raised, the way the thread engine drains its pipeline, so no
+# librados callback is left to post to a closed event loop
+
+async def run_request_loops(w, loop, units, qdepth, xattr_executor=None):
+  failures = []
+  shared_units = SharedUnits(units, failures)
+
+  async def request_loop():
+    try:
+      await async_request_loop(w, loop, shared_units, xattr_executor)
+    except Exception as e:
+      failures.append(e)
+
+  await asyncio.gather(*[ request_loop() for k in range(0, qdepth) ])
+  if len(failures) > 0:
+    raise failures[0]
+
+
+# asyncio equivalent of run_workload(),
+# blocking barrier calls run in the executor so they don't stall the event loop.
+# list and omap-read issue one request at a time by nature,
+# so they just run the thread-engine workload in the executor
+
+async def run_async_workload(w, executor):
+  loop = asyncio.get_running_loop()
+  if optype == 'list' or optype == 'omap-read':
+    await loop.run_in_executor(executor, run_workload, w)
+    return
+
+  await loop.run_in_executor(executor, await_starting_gun, w)
+  w.start_time = time.time()
+  if len(qdepth_steps) > 0:
+    names = endless_object_names(w)
+    for (step, step_qdepth) in enumerate(qdepth_steps):
+      if step > 0:
+        await loop.run_in_executor(executor, await_step_barrier, w, step)
+      w.step_histogram = LatencyHistogram()
+      step_start = time.time()
+      units = units_until(names, step_start + qdepth_step_secs)
+      await run_request_loops(w, loop, units, step_qdepth)
+      save_qdepth_step(w, step_qdepth, time.time() - step_start)
+  else:
+    if optype == 'omap-write':
+      for omap_obj in w.omap_shard_objs:
+        reset_omap_object(w.ioctx, omap_obj)
+      units = iter(range(0, omap_key_count, omap_kvpairs_per_call))
+    elif optype == 'omap-get' or optype == 'omap-range':
+      units = iter(omap_lookups(w))
+    elif optype == 'mix':
+      if 'omap-write' in mix_rq_types:
+        reset_omap_object(w.ioctx, w.per_thread_obj_name)
+      units = iter(mix_requests(w))
+    elif purge:
+      units = AsyncPurgeNames(w, loop, executor)
+    else:
+      units = iter(object_names(w))
+    if optype != 'cleanup':
+      units = units_for_duration(w, units)
+    if optype == 'xattr-read':
+      with ThreadPoolExecutor(max_workers=aio_qdepth) as xattr_executor:
+        await run_request_loops(w, loop, units, aio_qdepth, xattr_executor)
+    else:
+      await run_request_loops(w, loop, units, aio_qdepth)
+  await loop.run_in_executor(executor, post_done, w)
+  if w.elapsed_time < 0.0:
+    w.elapsed_time = time.time() - w.start_time
+
+
+async def run_async_worker(w, executor):
+  try:
+    await run_async_workload(w, executor)
+  except Exception as e:
+    w.error = e
+    print('ERROR: thread %s: %s' % (w.thread_id, str(e)))
+    if purge_lister:
+      purge_lister.release(w.thread_id)
+
+
+# run all workers in this process on one event loop,
+# executor needs a thread per worker since the starting gun blocks
+# until every worker has arrived
+
+async def run_async_workers(worker_list):
+  with ThreadPoolExecutor(max_workers=len(worker_list)) as executor:
+    await asyncio.gather(*[ run_async_worker(w, executor) for w in worker_list ])
+
+
+# run a worker in its own python thread, saving any exception
+# so the main thread can report it
+
+def run_worker_thread(w):
+  try:
+    run_workload(w)
+  except Exception as e:
+    w.error = e
+    print('ERROR: thread %s: %s' % (w.thread_id, str(e)))
+    w.pipeline.quiesce()
+    if purge_lister:
+      purge_lister.release(w.thread_id)
+
+
+# response time file for a worker,
+# each worker in a multi-worker process gets its own file
+
+def worker_rsptime_path(thread_id):
+  if len(worker_thread_ids) == 1:
+    return rsptime_path
+  (root, ext) = os.path.splitext(rsptime_path)
+  return '%s-%s%s' % (root, thread_id, ext)
+
+
+# binary file that a worker's response times are spooled to during the test,
+# for CSV format this is converted to the response time file at the end
+
+def worker_spool_path(thread_id):
+  if not rsptime_path:
+    return None
+  if rsptime_format == 'binary':
+    return worker_rsptime_path(thread_id)
+  return worker_rsptime_path(thread_id) + '.spool'
+
+
+# how far short of the open-loop target rate a worker fell, in percent
+
+def rate_shortfall_pct(achieved_rate):
+  return max(0.0, 100.0 * (target_rate - achieved_rate) / target_rate)
+
+
+# how much slower the slowest --omap-shards object was than the fastest,
+# as a ratio of their 99th percentile response times
+
+def shard_p99_skew(shard_results):
+  p99s = [ r['p99'] for r in shard_results if r['count'] > 0 ]
+  if len(p99s) == 0 or min(p99s) == 0.0:
+    return 0.0
+  return max(p99s) / min(p99s)
+
+
+# compute throughput for a worker and output it in requested format
+# returns the JSON object for this worker if JSON output was requested
+
+def report_results(w):
+    elapsed_time = w.elapsed_time
+    units_done = w.units_done
+
+    # measure throughput
+
     thru = 0.0
     transfer_rate = 0.0
+    achieved_rate = 0.0
     if elapsed_time > 0.0:
       thru = units_done / elapsed_time
+      achieved_rate = thru  # requests/sec, before counting omap batches as kvpairs
       if optype == 'omap-write':
         thru *= omap_kvpairs_per_call
         units_done *= omap_kvpairs_per_call
+      elif optype == 'omap-get' or optype == 'omap-range':
+        # lookups count the key-value pairs they actually got back
+        units_done = w.kvpairs_done
+        thru = units_done / elapsed_time
+      elif unit == 'attr':
+        thru *= xattr_count
+        units_done *= xattr_count
       if optype == "write" or optype == "read":
         if transfer_unit == 'MB':
           transfer_rate = thru * objsize / bytes_per_MB
         else:
           transfer_rate = thru * objsize / bytes_per_MiB
-      elif optype == 'omap-write' or optype == 'omap-read':
+      elif optype.startswith('omap'):
         if transfer_unit == 'MB':
           transfer_rate = thru * omap_value_size / bytes_per_MB
         else:
           transfer_rate = thru * omap_value_size / bytes_per_MiB
+      elif unit == 'attr':
+        if transfer_unit == 'MB':
+          transfer_rate = thru * xattr_size / bytes_per_MB
+        else:
+          transfer_rate = thru * xattr_size / bytes_per_MiB
+
+    # with --omap-shards, response times of each shard
+
+    shard_results = []
+    if optype != 'list':
+      for (shard, h) in enumerate(w.shard_histograms):
+        shard_results.append({ 'shard': shard,
+                               'object': w.omap_shard_objs[shard],
+                               'count': h.total,
+                               'p50': h.percentile(50.0),
+                               'p99': h.percentile(99.0),
+                               'max': h.max_usec / usec_per_sec })
+
+    # with --list-partitions, the xattr fetches each partition did.  the
+    # listing itself is one walk shared by all of them, so these are
+    # rates of xattr fetches, not of listing
+
+    partition_results = []
+    if optype == 'list' and list_partitions > 1 and elapsed_time > 0.0:
+      for (partition, h) in enumerate(w.shard_histograms):
+        partition_results.append({ 'partition': partition,
+                                   'xattr_fetches': h.total,
+                                   'throughput': h.total / elapsed_time,
+                                   'p50': h.percentile(50.0),
+                                   'p99': h.percentile(99.0) })
+
+    # with --mix, throughput of each request type
+    # from its requests completed in the measurement interval
+
+    rq_type_results = {}
+    if optype == 'mix' and elapsed_time > 0.0:
+      for (rq_type, h) in w.histograms.items():
+        rq_thru = h.total / elapsed_time
+        if rq_type == 'omap-write':
+          rq_bytes = omap_value_size * omap_kvpairs_per_call
+        else:
+          rq_bytes = objsize
+        if transfer_unit == 'MB':
+          rq_transfer_rate = rq_thru * rq_bytes / bytes_per_MB
+        else:
+          rq_transfer_rate = rq_thru * rq_bytes / bytes_per_MiB
+        transfer_rate += rq_transfer_rate
+        rq_type_results[rq_type] = { 'units_done': h.total,
+                                     'throughput': rq_thru,
+                                     'transfer_rate': rq_transfer_rate }
+
+    # save response time data in CSV format if desired
+
+    w.rsptime_recorder.close()
+    if rsptime_path and rsptime_format == 'csv':
+      spool_path = worker_spool_path(w.thread_id)
+      export_csv(spool_path, worker_rsptime_path(w.thread_id))
+      os.unlink(spool_path)
 
     # output results in requested format
 
+    worker_json = None
     if not output_json:
       print('')
-      print('results:')
+      if len(worker_thread_ids) > 1:
+        print('results for thread %s:' % w.thread_id)
+      else:
+        print('results:')
       print('elapsed time = %f' % elapsed_time)
       print('%ss done in measurement interval = %d' % (unit, units_done))
-      if adjusting_think_time and (think_time_sec > 0.0):
-        print('last_think_time: %f' % think_time_sec)
-      if elapsed_time < 0.001:
+      if adjusting_think_time and (w.think_time_sec > 0.0):
+        print('last_think_time: %f' % w.think_time_sec)
+      # a cleanup or purge with nothing to remove can finish at once
+      if elapsed_time < 0.001 and units_done > 0:
         usage('elapsed time %f is too short, no stats for you!' % elapsed_time)
       print('throughput = %f %ss/sec' % (thru, unit))
       if transfer_rate > 0.0:
@@ -644,25 +2557,350 @@ with rados.Rados(conffile=ceph_conf_file, conf=dict(keyring=keyring_path)) as cl
           print('transfer rate = %f MB/s' % transfer_rate)
         else:
           print('transfer rate = %f MiB/s' % transfer_rate)
-      if done_checks > 0:
-        print('checks for test done = %d' % done_checks)
+      if w.done_checks > 0:
+        print('checks for test done = %d' % w.done_checks)
+      if target_rate > 0.0:
+        print('open-loop target rate = %f requests/sec, achieved = %f (%f%% short)' % (
+              target_rate, achieved_rate, rate_shortfall_pct(achieved_rate)))
+        print('most behind schedule a request was sent (sec) = %f' % w.max_send_lag)
+      if len(w.qdepth_steps) > 0:
+        print('qdepth  throughput (%ss/sec)  p99 response time (sec)' % unit)
+        for st in w.qdepth_steps:
+          print('%6d  %24f  %23f' % (st['qdepth'], st['throughput'], st['latency']['p99']))
+        (knee, leveled_off) = find_knee([ (st['qdepth'], st['throughput']) for st in w.qdepth_steps ],
+                                        knee_gain_pct)
+        if leveled_off:
+          print('throughput knee at qdepth %d' % knee)
+        else:
+          print('throughput still gained %g%% or more at qdepth %d' % (knee_gain_pct, knee))
+      if w.verified > 0:
+        print('objects verified = %d, failures = %d, verification time = %f sec (%f usec/object)' % (
+              w.verified, w.verify_failures, w.verify_secs, w.verify_secs * usec_per_sec / w.verified))
+      for (rq_type, r) in sorted(rq_type_results.items()):
+        print('%s: %d requests, throughput = %f requests/sec, transfer rate = %f %s/s' % (
+              rq_type, r['units_done'], r['throughput'], r['transfer_rate'], transfer_unit))
+      for (rq_type, h) in sorted(w.histograms.items()):
+        pcts = ', '.join([ 'p%g = %f' % (pct, h.percentile(pct)) for pct in report_percentiles ])
+        print('%s response time (sec): %s, max = %f' % (rq_type, pcts, h.max_usec / usec_per_sec))
+      if len(shard_results) > 0:
+        print('shard  requests  p50 response time (sec)  p99 response time (sec)')
+        for r in shard_results:
+          print('%5d  %8d  %23f  %23f' % (r['shard'], r['count'], r['p50'], r['p99']))
+        print('slowest shard p99 / fastest shard p99 = %f' % shard_p99_skew(shard_results))
+      if len(partition_results) > 0:
+        print('the listing is one sequential walk, partitions only fetch xattrs in parallel')
+        print('partition  xattr fetches  fetches/sec  p50 xattr time (sec)  p99 xattr time (sec)')
+        for r in partition_results:
+          print('%9d  %13d  %11f  %20f  %20f' % (r['partition'], r['xattr_fetches'], r['throughput'],
+                                                 r['p50'], r['p99']))
     else:
+      worker_json = dict(json_obj)
+      worker_json['params'] = dict(params)
+      worker_json['params']['thread_id'] = w.thread_id
       results = {}
       results['elapsed'] = elapsed_time
       results['units_done'] = units_done
       if transfer_rate > 0.0:
         results['transfer_rate'] = transfer_rate
-      if adjusting_think_time and (think_time_sec > 0.0):
-        results['last_think_time'] = think_time_sec
-      if threads_total > 1:
-        results['done_checks'] = done_checks
-      json_obj['results'] = results
-      print(json.dumps(json_obj, indent=4))
-
-    # save response time data if desired
-
-    if rsptime_path:
-      with open(rsptime_path, "w") as rspf:
-        for (call_start, call_duration) in response_times:
-          rspf.write('%f, %f\n' % (call_start, call_duration))
-  
+      if adjusting_think_time and (w.think_time_sec > 0.0):
+        results['last_think_time'] = w.think_time_sec
+      if w.done_checks > 0:
+        results['done_checks'] = w.done_checks
+      if len(rq_type_results) > 0:
+        results['rq_types'] = rq_type_results
+      if len(w.qdepth_steps) > 0:
+        results['qdepth_steps'] = w.qdepth_steps
+      if target_rate > 0.0:
+        results['target_rate'] = target_rate
+        results['achieved_rate'] = achieved_rate
+        results['rate_shortfall_pct'] = rate_shortfall_pct(achieved_rate)
+        results['max_send_lag'] = w.max_send_lag
+      if len(shard_results) > 0:
+        results['omap_shards'] = shard_results
+        results['shard_p99_skew'] = shard_p99_skew(shard_results)
+      if len(partition_results) > 0:
+        results['list_partitions'] = partition_results
+      if w.verified > 0:
+        results['verify'] = { 'objects': w.verified,
+                              'failures': w.verify_failures,
+                              'secs': w.verify_secs,
+                              'usec_per_object': w.verify_secs * usec_per_sec / w.verified }
+      if len(w.histograms) > 0:
+        results['latency'] = dict([ (rq_type, h.to_dict()) for (rq_type, h) in w.histograms.items() ])
+      worker_json['results'] = results
+
+    return worker_json
+
+
+# run workers in this process
+# returns list of per-worker JSON results (None in text mode)
+# and count of failed workers
+#
+# if you add this to ceph.conf file, 
+# then you don't need to specify keyring in Rados constructor
+#   keyring = /root/ben/ceph.client.admin.keyring
+# alternatively don't use cephx
+
+def run_local_workers(thread_ids):
+  global done_watcher, verifier, purge_lister
+  with rados.Rados(conffile=ceph_conf_file, conf=dict(keyring=keyring_path)) as cluster:
+    #print(cluster.get_fsid())
+    pools = cluster.list_pools()
+    if not pools.__contains__(mypool):
+      cluster.create_pool(mypool) # FIXME: race condition if multiple threads
+      print('created pool ' + mypool)
+    ioctx = cluster.open_ioctx(mypool)
+
+    # all workers in this process share the cluster handle and ioctx,
+    # and one threads-done watcher unless the parent process runs it
+
+    if threads_total > 1 and not local_coordinator:
+      done_watcher = DoneWatcher(ioctx)
+    if verify_data and (optype == 'read' or optype == 'mix'):
+      verifier = ObjectVerifier()
+    if purge:
+      purge_lister = PurgeLister(ioctx, thread_ids)
+    worker_list = [ Worker(ioctx, tid) for tid in thread_ids ]
+    if engine == 'asyncio':
+      asyncio.run(run_async_workers(worker_list))
+    elif len(worker_list) == 1:
+      run_worker_thread(worker_list[0])
+    else:
+      worker_threads = [ threading.Thread(target=run_worker_thread, args=(w,))
+                         for w in worker_list ]
+      for t in worker_threads: t.start()
+      for t in worker_threads: t.join()
+    if done_watcher:
+      done_watcher.stop()
+      for w in worker_list:
+        w.done_checks = done_watcher.checks
+    if purge_lister:
+      purge_lister.stop()
+    ioctx.close()
+
+  # a worker that read back bad data failed, even if its requests succeeded
+
+  if verifier:
+    verifier.stop()
+    for w in worker_list:
+      if w.verify_failures > 0 and w.error is None:
+        w.error = Exception('%d of %d objects failed verification, first: %s' %
+                            (w.verify_failures, w.verified, w.verify_error))
+        print('ERROR: thread %s: %s' % (w.thread_id, str(w.error)))
+
+  failed = [ w for w in worker_list if w.error is not None ]
+  if len(failed) > 0:
+    return ([], len(failed))
+  if local_coordinator:
+    # don't interleave text results with other processes on this host
+    with local_coordinator.print_lock:
+      return ([ report_results(w) for w in worker_list ], 0)
+  return ([ report_results(w) for w in worker_list ], 0)
+
+
+# body of a worker process forked by --processes,
+# pinned to one of the CPUs this process is allowed to run on
+
+def run_child_process(k, coord):
+  global local_coordinator
+  local_coordinator = coord
+  cpus = sorted(os.sched_getaffinity(0))
+  os.sched_setaffinity(0, { cpus[k % len(cpus)] })
+  my_thread_ids = worker_thread_ids[k*workers:(k+1)*workers]
+  try:
+    (worker_results, failed) = run_local_workers(my_thread_ids)
+  except Exception as e:
+    print('ERROR: process %d: %s' % (k, str(e)))
+    (worker_results, failed) = ([], len(my_thread_ids))
+  coord.results_q.put((k, worker_results, failed))
+
+
+# fork --processes worker processes on this host and coordinate them,
+# returns merged per-worker JSON results and count of failed workers
+
+def run_processes():
+  ctx = multiprocessing.get_context('fork')
+  coord = LocalCoordinator(ctx, len(worker_thread_ids))
+  sys.stdout.flush()  # so children don't repeat buffered output
+  children = [ ctx.Process(target=run_child_process, args=(k, coord))
+               for k in range(0, processes) ]
+  for c in children: c.start()
+  all_results = {}
+  failed = 0
+
+  # collect results from a child, return False if none arrived in time
+
+  def collect_results(timeout):
+    nonlocal failed
+    try:
+      (k, worker_results, child_failed) = coord.results_q.get(timeout=timeout)
+    except queue.Empty:
+      return False
+    all_results[k] = worker_results
+    failed += child_failed
+    return True
+
+  # children that exited without reporting results
+
+  def children_lost():
+    return len([ c for c in children if c.is_alive() ]) == 0 and coord.results_q.empty()
+
+  with rados.Rados(conffile=ceph_conf_file, conf=dict(keyring=keyring_path)) as cluster:
+    ioctx = cluster.open_ioctx(mypool)
+    watcher = None
+    if threads_total > 1:
+      watcher = DoneWatcher(ioctx, coord)
+
+    # once every local worker has arrived, register them all at once
+    # with the rest of the test and fire the local starting gun
+
+    while coord.ready.value < coord.local_thread_count:
+      if collect_results(0.1) or children_lost():
+        break  # a child failed before reaching the starting line
+    if len(all_results) == 0 and coord.ready.value == coord.local_thread_count:
+      fire_starting_gun(ioctx, worker_thread_ids)
+      if watcher:
+        watcher.start_checking()
+    coord.go.set()
+
+    # relay threads-done events until every child has reported its results,
+    # the watcher sets the measurement-over flag for the children
+
+    while len(all_results) < processes:
+      if not collect_results(1.0) and children_lost():
+        failed += (processes - len(all_results)) * workers
+        break
+      done_ids = []
+      try:
+        while True:
+          done_ids.append(coord.done_q.get_nowait())
+      except queue.Empty:
+        pass
+      if len(done_ids) > 0:
+        post_threads_done(ioctx, done_ids)
+    if watcher:
+      watcher.stop()
+    ioctx.close()
+
+  for c in children: c.join()
+  worker_results = []
+  for k in sorted(all_results.keys()):
+    worker_results.extend(all_results[k])
+  return (worker_results, failed)
+
+
+# --pg-balance: pg_num of the pool, unless --pg-count gave it, and the
+# OSDs that each of its PGs maps to, or None if the cluster won't say.
+# asks the monitors and manager over a connection of its own
+
+def pool_placement():
+  with rados.Rados(conffile=ceph_conf_file, conf=dict(keyring=keyring_path)) as cluster:
+    pg_num = pg_count
+    if not pg_num:
+      cmd = json.dumps({ 'prefix': 'osd pool get', 'pool': mypool, 'var': 'pg_num', 'format': 'json' })
+      (ret, outbuf, outs) = cluster.mon_command(cmd, b'')
+      if ret < 0:
+        usage('could not get pg_num of pool %s: %s, use --pg-count' % (mypool, outs or os.strerror(-ret)))
+      pg_num = json.loads(outbuf)['pg_num']
+    pg_osds = None
+    if hasattr(cluster, 'mgr_command'):
+      cmd = json.dumps({ 'prefix': 'pg ls-by-pool', 'poolstr': mypool, 'format': 'json' })
+      (ret, outbuf, outs) = cluster.mgr_command(cmd, b'')
+      if ret == 0:
+        pg_stats = json.loads(outbuf)
+        if isinstance(pg_stats, dict):
+          pg_stats = pg_stats.get('pg_stats', [])
+        pg_osds = dict([ (int(st['pgid'].split('.')[1], 16), st['acting']) for st in pg_stats ])
+  return (pg_num, pg_osds)
+
+
+# expected objects in each PG and on each OSD for the threads run here,
+# and for comparison what the default object names would have given.
+# threads on other hosts aren't included
+
+def placement_report(pg_osds):
+  per_pg = pg_object_counts([ objnm for tid in worker_thread_ids
+                              for objnm in thread_object_names(tid) ], pg_count)
+  default_per_pg = pg_object_counts([ next_objnm(tid, j) for tid in worker_thread_ids
+                                      for j in range(0, objcount) ], pg_count)
+  report = { 'pg_count': pg_count,
+             'thread_ids': worker_thread_ids,
+             'objects_per_pg': { 'min': min(per_pg), 'max': max(per_pg),
+                                 'mean': sum(per_pg) / float(pg_count) },
+             'default_objects_per_pg': { 'min': min(default_per_pg), 'max': max(default_per_pg) } }
+  if pg_osds is not None:
+    per_osd = {}
+    primary_per_osd = {}
+    for (pg, objects) in enumerate(per_pg):
+      acting = pg_osds.get(pg, [])
+      for osd in acting:
+        per_osd[osd] = per_osd.get(osd, 0) + objects
+      if len(acting) > 0:
+        primary_per_osd[acting[0]] = primary_per_osd.get(acting[0], 0) + objects
+    report['osds'] = [ { 'osd': osd, 'objects': per_osd[osd], 'primary': primary_per_osd.get(osd, 0) }
+                       for osd in sorted(per_osd.keys()) ]
+  return report
+
+
+def print_placement_report(report):
+  pg = report['objects_per_pg']
+  default_pg = report['default_objects_per_pg']
+  print('placement of the objects of the %d threads run here' % len(report['thread_ids']), end='')
+  if threads_total > len(report['thread_ids']):
+    print(', not of the other %d threads' % (threads_total - len(report['thread_ids'])), end='')
+  print('')
+  print('expected objects per PG over %d PGs: min = %d, max = %d, mean = %f' % (
+        report['pg_count'], pg['min'], pg['max'], pg['mean']))
+  print('default object names would give: min = %d, max = %d' % (default_pg['min'], default_pg['max']))
+  if 'osds' in report:
+    print('  osd  objects  as primary')
+    for r in report['osds']:
+      print('%5d  %7d  %10d' % (r['osd'], r['objects'], r['primary']))
+  else:
+    print('PG to OSD map not available, no per-OSD distribution')
+
+
+# build the pool that object data comes from, the omap-write batches and xattrs,
+# once before any worker processes are forked so they all share them
+
+if optype == 'write' or optype == 'mix':
+  seed = 0
+  if random_seed is not None:
+    seed = random_seed
+  data_len = objsize
+  if verify_data:
+    data_len -= object_header_size
+  data_pattern = DataPattern(data_len, data_pattern_name, compress_pct, seed)
+if optype == 'omap-write' or 'omap-write' in mix_rq_types:
+  build_omap_batches()
+# the names depend on pg_num, so it is saved with the results, and
+# cleanup must be given it with --pg-count if pg_num has changed since
+
+if pg_balance and not purge:
+  (pg_count, pg_osds) = pool_placement()
+  for tid in worker_thread_ids:
+    thread_object_names(tid)
+  placement = placement_report(pg_osds)
+  if output_json:
+    params['pg_count'] = pg_count
+    json_obj['placement'] = placement
+  else:
+    print('object names are for pg_num %d, clean them up with --pg-balance true --pg-count %d, or with --purge true' %
+          (pg_count, pg_count))
+    print_placement_report(placement)
+if unit == 'attr':
+  xattr_names = [ 'roperf.%d' % k for k in range(0, xattr_count) ]
+  xattr_value = (fixed_pattern * (xattr_size // len(fixed_pattern) + 1))[0:xattr_size]
+
+if processes > 1:
+  (worker_results, failed) = run_processes()
+else:
+  (worker_results, failed) = run_local_workers(worker_thread_ids)
+if failed > 0:
+  sys.stderr.write('ERROR: %d of %d workers failed\n' % (failed, len(worker_thread_ids)))
+  sys.exit(1)
+if output_json:
+  if len(worker_thread_ids) == 1:
+    print(json.dumps(worker_results[0], indent=4))
+  else:
+    print(json.dumps({'workers': worker_results}, indent=4))
@@ -0,0 +1,100 @@
+#
+# roperf_access.py - random object and omap key choice for rados_object_perf.py
+#
+# with uniform, zipf or hotset access, each request picks a popularity
+# rank at random, and a fixed scatter turns the rank into an item number
+# (an object of some thread, or an omap key).  nothing is kept per item,
+# so choosing among a billion objects costs the same as among ten, and an
+# object's name is only formatted once it has been chosen.  the scatter
+# depends only on the seed, so every process agrees on which items are hot,
+# and they are spread over all of the items, not bunched at the start
+#
+
+import math, random
+
+access_types = [ 'uniform', 'zipf', 'hotset' ]
+
+# log(1 + x) / x and (exp(x) - 1) / x, accurate near x = 0
+
+def log1p_over_x(x):
+  if abs(x) > 1e-8:
+    return math.log1p(x) / x
+  return 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x))
+
+
+def expm1_over_x(x):
+  if abs(x) > 1e-8:
+    return math.expm1(x) / x
+  return 1.0 + x * 0.5 * (1.0 + x * (1.0 / 3.0) * (1.0 + 0.25 * x))
+
+
+# zipf ranks 1 through n, rank k chosen with weight 1 / k**exponent,
+# by Hormann and Derflinger's rejection-inversion method, which takes
+# constant time and memory per choice however big n is
+
+class ZipfRanks:
+
+  def __init__(self, n, exponent):
+    self.n = n
+    self.exponent = exponent
+    self.h_integral_x1 = self.h_integral(1.5) - 1.0
+    self.h_integral_n = self.h_integral(n + 0.5)
+    self.squeeze = 2.0 - self.h_integral_inverse(self.h_integral(2.5) - self.h(2.0))
+
+  def h(self, x):
+    return math.exp(-self.exponent * math.log(x))
+
+  def h_integral(self, x):
+    log_x = math.log(x)
+    return expm1_over_x((1.0 - self.exponent) * log_x) * log_x
+
+  def h_integral_inverse(self, x):
+    t = max(-1.0, x * (1.0 - self.exponent))
+    return math.exp(log1p_over_x(t) * x)
+
+  def sample(self, rng):
+    while True:
+      u = self.h_integral_n + rng.random() * (self.h_integral_x1 - self.h_integral_n)
+      x = self.h_integral_inverse(u)
+      k = min(max(int(x + 0.5), 1), self.n)
+      if k - x <= self.squeeze or u >= self.h_integral(k + 0.5) - self.h(k):
+        return k
+
+
+# chooses item numbers 0 through n-1 with the given access type.
+# rank 0 is the most popular, hotset's hot set is the first
+# hotset_obj_pct percent of ranks
+
+class RandomAccess:
+
+  def __init__(self, n, access, seed=0, zipf_exponent=0.99, hotset_obj_pct=20.0, hotset_rq_pct=80.0):
+    self.n = n
+    self.access = access
+    self.hotset_rq_pct = hotset_rq_pct
+    self.hot_n = min(n, max(1, int(n * hotset_obj_pct / 100.0)))
+    if access == 'zipf':
+      self.zipf = ZipfRanks(n, zipf_exponent)
+
+    # rank r is item (stride * r + offset) mod n, and a stride
+    # with no factor in common with n makes that one to one
+
+    scatter_rng = random.Random(seed)
+    self.offset = scatter_rng.randrange(n)
+    self.stride = scatter_rng.randrange(1, max(2, n))
+    while math.gcd(self.stride, n) != 1:
+      self.stride += 1
+
+  def rank(self, rng):
+    if self.access == 'zipf':
+      return self.zipf.sample(rng) - 1
+    if self.access == 'hotset' and self.hot_n < self.n:
+      if rng.random() * 100.0 < self.hotset_rq_pct:
+        return rng.randrange(self.hot_n)
+      return self.hot_n + rng.randrange(self.n - self.hot_n)
+    return rng.randrange(self.n)
+
+  def item(self, rank):
+    return (self.stride * rank + self.offset) % self.n
+
+  def choose(self, rng):
+    return self.item(self.rank(rng))
@@ -0,0 +1,204 @@
+#
+# roperf_data.py - object data patterns for rados_object_perf.py
+#
+# all object data is carved out of one preallocated pool, so writing an
+# object never builds a new payload.  patterns are:
+#
+#   fixed   - '0123456789abcdef' repeated, every object is the same and
+#             compresses and dedups completely (the original behavior)
+#   random  - pseudo-random bytes, every object is the same
+#   unique  - pseudo-random bytes, each object gets its own window of the
+#             pool, at an offset chosen from a hash of the object name, so
+#             objects differ from each other but the same object name always
+#             gets the same content.  with a python rados binding that only
+#             takes bytes, each window is copied as it is written
+#
+# for random and unique, compress_pct percent of every 4 KiB block is zeros,
+# so compression should shrink the data to about (100 - compress_pct)% of
+# its size.  the pool contents depend only on the seed, so a reader can
+# rebuild exactly what was written.
+#
+# with --verify, each object starts with a header and the rest of it is
+# the pattern data.  header, 128 bytes, all little-endian:
+#
+#   magic        8 bytes   b'ROPERFOB'
+#   version      u16       1
+#   checksum     u16       checksum algorithm, see checksum_codes
+#   generation   u64       sequence number of the write in its process
+#   data length  u64       bytes of data after the header
+#   checksum     u64       checksum of the data after the header
+#   object name  92 bytes  UTF-8, NUL padded
+#
+
+import random, threading, zlib, struct
+
+# faster checksums are optional, crc32 is always there
+
+try:
+  import crc32c
+except ImportError:
+  crc32c = None
+try:
+  import xxhash
+except ImportError:
+  xxhash = None
+
+data_patterns = [ 'fixed', 'random', 'unique' ]
+
+fixed_pattern = b'0123456789abcdef'
+
+# compressibility is controlled per block of this size
+
+pattern_block_size = 4096
+
+# unique objects start at offsets in [0, pattern_slack) of the pool,
+# which is this much bigger than an object
+
+pattern_slack = 1 << 20
+
+class DataPattern:
+
+  # size - bytes per object
+  # pattern - one of data_patterns
+  # compress_pct - percent of each block that is zeros, random and unique only
+  # seed - seed for pseudo-random pool contents
+
+  def __init__(self, size, pattern='fixed', compress_pct=0.0, seed=0):
+    self.size = size
+    self.pattern = pattern
+    self.compress_pct = compress_pct
+    self.lock = threading.Lock()
+
+    # try passing buffers to the python rados binding without copying,
+    # until it turns out to insist on bytes
+
+    self.zero_copy = True
+    self.checksums = {}  # pool offset -> checksum of the data there
+    pool_size = size
+    if pattern == 'unique':
+      pool_size += pattern_slack
+
+    # fill the pool in place so it is only ever allocated once
+
+    self.pool = bytearray(pool_size)
+    self.view = memoryview(self.pool)
+    if pattern == 'fixed':
+      # copy what is already filled in after itself until the pool is full
+      filled = min(len(fixed_pattern), pool_size)
+      self.pool[0:filled] = fixed_pattern[0:filled]
+      while filled < pool_size:
+        n = min(filled, pool_size - filled)
+        self.pool[filled:filled+n] = self.view[0:n]
+        filled += n
+    else:
+      rng = random.Random(seed)
+      zero_bytes = int(pattern_block_size * compress_pct / 100.0)
+      for off in range(0, pool_size, pattern_block_size):
+        end = min(off + pattern_block_size, pool_size)
+        if off + zero_bytes < end:
+          self.pool[off + zero_bytes:end] = rng.randbytes(end - off - zero_bytes)
+
+  # offset in the pool where this object's data starts
+
+  def offset(self, objnm):
+    if self.pattern != 'unique':
+      return 0
+    return zlib.crc32(objnm.encode('utf-8')) % pattern_slack
+
+  # data to write to this object, a zero-copy slice of the pool
+  # unless the binding needs bytes
+
+  def buffer(self, objnm):
+    if self.pattern != 'unique':
+      return self.pool
+    window = self.view[self.offset(objnm):self.offset(objnm) + self.size]
+    if self.zero_copy:
+      return window
+    return bytes(window)
+
+  # checksum of the data for this object, computed once per pool offset,
+  # so for fixed and random patterns only once
+
+  def checksum(self, objnm, csum_fn):
+    off = self.offset(objnm)
+    csum = self.checksums.get(off)
+    if csum is None:
+      csum = csum_fn(self.view[off:off + self.size])
+      self.checksums[off] = csum
+    return csum
+
+  # called when the binding rejected a buffer that was not bytes.
+  # if every object has the same data, the pool becomes bytes once,
+  # otherwise each unique window has to be copied to bytes as it is written,
+  # an allocation and copy per write that only a binding taking buffers avoids.
+  # the old view is not released, other threads may still be checksumming
+  # slices of it, it goes away with the last of them
+
+  def needs_bytes(self):
+    with self.lock:
+      if not self.zero_copy:
+        return
+      self.zero_copy = False
+      if self.pattern != 'unique':
+        self.pool = bytes(self.pool)
+        self.view = memoryview(self.pool)
+
+
+object_magic = b'ROPERFOB'
+object_header_version = 1
+object_header_struct = struct.Struct('<8sHHQQQ92s')
+object_header_size = object_header_struct.size
+
+checksum_codes = {
+  'crc32': 1,
+  'crc32c': 2,   # needs the crc32c module
+  'xxhash': 3,   # XXH64, needs the xxhash module
+  }
+checksum_names = dict([ (code, name) for (name, code) in checksum_codes.items() ])
+
+# function computing a checksum of a buffer as an integer,
+# or None if the module for it isn't installed
+
+def checksum_function(name):
+  if name == 'crc32':
+    return zlib.crc32
+  if name == 'crc32c' and crc32c is not None:
+    return crc32c.crc32c
+  if name == 'xxhash' and xxhash is not None:
+    return xxhash.xxh64_intdigest
+  return None
+
+
+# header for an object whose data after the header has checksum csum
+
+def object_header(objnm, generation, data_len, checksum_name, csum):
+  return object_header_struct.pack(object_magic, object_header_version,
+                                   checksum_codes[checksum_name], generation, data_len, csum,
+                                   objnm.encode('utf-8')[:92])
+
+
+# check the header and data of an object read back with --verify,
+# returns None if it is good, else a description of what is wrong
+
+def verify_object(objnm, data):
+  if len(data) < object_header_size:
+    return '%s: only %d bytes, too short for a header' % (objnm, len(data))
+  (magic, version, csum_code, generation, data_len, csum, name) = \
+      object_header_struct.unpack_from(data)
+  if magic != object_magic or version != object_header_version:
+    return '%s: no object header, was it written with --verify?' % objnm
+  name = name.rstrip(b'\0').decode('utf-8', 'replace')
+  if name != objnm[:92]:
+    return '%s: header is for object %s' % (objnm, name)
+  if data_len != len(data) - object_header_size:
+    return '%s: header says %d bytes of data, read %d' % (
+           objnm, data_len, len(data) - object_header_size)
+  checksum_name = checksum_names.get(csum_code, str(csum_code))
+  csum_fn = checksum_function(checksum_name)
+  if csum_fn is None:
+    return '%s: checksum %s is not available here' % (objnm, checksum_name)
+  actual = csum_fn(memoryview(data)[object_header_size:])
+  if actual != csum:
+    return '%s: %s checksum 0x%x does not match 0x%x in header, generation %d' % (
+           objnm, checksum_name, actual, csum, generation)
+  return None
@@ -0,0 +1,136 @@
+#
+# roperf_launch.py - transports and launch commands for rados-obj-perf.py
+#
+# a transport runs commands on client hosts and copies files to and from
+# them.  SshTransport does it over one reused ssh connection per host,
+# LocalTransport runs every "host" as local subprocesses
+#
+
+import os, subprocess, shutil, glob
+from concurrent.futures import ThreadPoolExecutor
+
+OK = 0
+NOTOK = 1
+
+# directory on client hosts holding rados_object_perf.py, thread logs and
+# response time files, relative to the login directory
+
+remote_dir = 'rados_object_perf'
+
+# exit status we report for a thread whose status we never heard
+
+unknown_status = 255
+
+
+# runs commands on client hosts over ssh,
+# keeping one master connection per host that every command and copy reuses
+
+class SshTransport:
+
+  def __init__(self, control_dir):
+    self.control_dir = control_dir
+    self.ssh_opts = [ '-o', 'BatchMode=yes',
+                      '-o', 'ControlMaster=auto',
+                      '-o', 'ControlPath=%s/%%C' % control_dir,
+                      '-o', 'ControlPersist=600' ]
+
+  # establish master connection so later commands don't pay for ssh setup
+
+  def connect(self, host):
+    return subprocess.call([ 'ssh' ] + self.ssh_opts + [ host, 'true' ])
+
+  def start(self, host, cmd, out_path):
+    with open(out_path, 'w') as outf:
+      return subprocess.Popen([ 'ssh' ] + self.ssh_opts + [ host, cmd ],
+                              stdout=outf, stderr=subprocess.STDOUT)
+
+  def run(self, host, cmd, out_path):
+    return self.start(host, cmd, out_path).wait()
+
+  def copy_to(self, host, paths, dest_dir):
+    return subprocess.call([ 'scp', '-q' ] + self.ssh_opts + paths +
+                           [ '%s:%s/' % (host, dest_dir) ])
+
+  def copy_from(self, host, remote_pattern, local_dir):
+    return subprocess.call([ 'scp', '-q' ] + self.ssh_opts +
+                           [ '%s:%s' % (host, remote_pattern), local_dir ])
+
+  def disconnect(self, host):
+    return subprocess.call([ 'ssh' ] + self.ssh_opts + [ '-O', 'exit', host ],
+                           stderr=subprocess.DEVNULL)
+
+
+# runs "remote" commands as local subprocesses, so the launch logic
+# can be exercised without ssh.  each host name gets its own directory
+# standing in for that host's login directory
+
+class LocalTransport:
+
+  def __init__(self, hosts_dir):
+    self.hosts_dir = hosts_dir
+
+  def host_dir(self, host):
+    d = os.path.join(self.hosts_dir, host)
+    os.makedirs(d, exist_ok=True)
+    return d
+
+  def connect(self, host):
+    self.host_dir(host)
+    return OK
+
+  def start(self, host, cmd, out_path):
+    with open(out_path, 'w') as outf:
+      return subprocess.Popen([ 'sh', '-c', cmd ], cwd=self.host_dir(host),
+                              stdout=outf, stderr=subprocess.STDOUT)
+
+  def run(self, host, cmd, out_path):
+    return self.start(host, cmd, out_path).wait()
+
+  def copy_to(self, host, paths, dest_dir):
+    d = os.path.join(self.host_dir(host), dest_dir)
+    os.makedirs(d, exist_ok=True)
+    for p in paths:
+      shutil.copy(p, d)
+    return OK
+
+  def copy_from(self, host, remote_pattern, local_dir):
+    for p in glob.glob(os.path.join(self.host_dir(host), remote_pattern)):
+      shutil.copy(p, local_dir)
+    return OK
+
+  def disconnect(self, host):
+    return OK
+
+
+# run fn(host) for every host at the same time, return list of results
+
+def on_all_hosts(hosts, fn):
+  with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+    return list(executor.map(fn, hosts))
+
+
+# build a single shell command that starts all of a host's threads
+# in the background and prints "exit <thread> <status>" as each one finishes
+# inputs:
+#   thread_cmds - list of (padded thread number, rados_object_perf.py command)
+
+def host_launch_cmd(thread_cmds):
+  parts = [ 'cd %s || exit 1 ;' % remote_dir ]
+  for (padded_n, cmd) in thread_cmds:
+    parts.append('( %s > rados-wl-thread-%s.log 2>&1 ; echo "exit %s $?" ) &' %
+                 (cmd, padded_n, padded_n))
+  parts.append('wait')
+  return ' '.join(parts)
+
+
+# parse per-thread exit status lines from a host's launch output,
+# threads we never heard from get unknown_status
+
+def parse_exit_status(out_path, padded_thread_nums):
+  status = dict([ (n, unknown_status) for n in padded_thread_nums ])
+  with open(out_path, 'r') as outf:
+    for line in outf.readlines():
+      fields = line.split()
+      if len(fields) == 3 and fields[0] == 'exit' and fields[1] in status:
+        status[fields[1]] = int(fields[2])
+  return status
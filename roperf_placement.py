@@ -0,0 +1,101 @@
+#
+# roperf_placement.py - object to PG placement for rados_object_perf.py
+#
+# Ceph places an object (with no locator key or namespace) in a PG by
+# hashing its name with the rjenkins hash and folding the hash into the
+# pool's pg_num with ceph_stable_mod().  computing that here lets
+# rados_object_perf.py choose object names that spread evenly over the
+# PGs of a pool, instead of leaving a small object set to hashing luck.
+#
+
+import struct
+
+golden_ratio = 0x9e3779b9
+mask32 = 0xffffffff
+
+rjenkins_block = struct.Struct('<III')
+
+# Bob Jenkins' 96-bit mix, as in ceph_hash.cc
+
+def rjenkins_mix(a, b, c):
+  a = (a - b - c) & mask32;  a ^= c >> 13
+  b = (b - c - a) & mask32;  b ^= (a << 8) & mask32
+  c = (c - a - b) & mask32;  c ^= b >> 13
+  a = (a - b - c) & mask32;  a ^= c >> 12
+  b = (b - c - a) & mask32;  b ^= (a << 16) & mask32
+  c = (c - a - b) & mask32;  c ^= b >> 5
+  a = (a - b - c) & mask32;  a ^= c >> 3
+  b = (b - c - a) & mask32;  b ^= (a << 10) & mask32
+  c = (c - a - b) & mask32;  c ^= b >> 15
+  return (a, b, c)
+
+
+# ceph_str_hash_rjenkins() of a byte string
+
+def str_hash_rjenkins(key):
+  length = len(key)
+  a = b = golden_ratio
+  c = 0
+  whole = length - length % 12
+  for (k0, k1, k2) in rjenkins_block.iter_unpack(key[0:whole]):
+    (a, b, c) = rjenkins_mix((a + k0) & mask32, (b + k1) & mask32, (c + k2) & mask32)
+
+  # the last 0 to 11 bytes, zero padded, the low byte of c is the length
+
+  (k0, k1, k2) = rjenkins_block.unpack(key[whole:] + bytes(12 - (length - whole)))
+  (a, b, c) = rjenkins_mix((a + k0) & mask32, (b + k1) & mask32,
+                           (c + length + (k2 << 8)) & mask32)
+  return c
+
+
+# fold a hash into b buckets where bmask is the next power of 2 minus 1,
+# so that growing pg_num only splits PGs, as ceph_stable_mod() does
+
+def stable_mod(x, b, bmask):
+  if (x & bmask) < b:
+    return x & bmask
+  return x & (bmask >> 1)
+
+
+def pg_num_mask(pg_num):
+  return (1 << (pg_num - 1).bit_length()) - 1
+
+
+# PG number within its pool that an object name maps to
+
+def object_pg(objnm, pg_num):
+  return stable_mod(str_hash_rjenkins(objnm.encode('utf-8')), pg_num, pg_num_mask(pg_num))
+
+
+# count names formatted by name_fn(0), name_fn(1) ... skipping any whose
+# PG already has its share, until there are count names.  every PG gets
+# count // pg_num names, and count % pg_num PGs get one more.
+# returns the list of names
+
+def pg_balanced_names(name_fn, count, pg_num):
+  bmask = pg_num_mask(pg_num)
+  per_pg = [ 0 for pg in range(0, pg_num) ]
+  level = max(1, count // pg_num)
+  names = []
+  j = 0
+  while len(names) < count:
+    objnm = name_fn(j)
+    j += 1
+    pg = stable_mod(str_hash_rjenkins(objnm.encode('utf-8')), pg_num, bmask)
+    if per_pg[pg] >= level:
+      continue
+    per_pg[pg] += 1
+    names.append(objnm)
+    if len(names) == level * pg_num:
+      level += 1
+  return names
+
+
+# objects in each PG for a list of names
+
+def pg_object_counts(names, pg_num):
+  bmask = pg_num_mask(pg_num)
+  per_pg = [ 0 for pg in range(0, pg_num) ]
+  for objnm in names:
+    per_pg[stable_mod(str_hash_rjenkins(objnm.encode('utf-8')), pg_num, bmask)] += 1
+  return per_pg
@@ -0,0 +1,292 @@
+#
+# roperf_stats.py - response time recording and latency histograms
+# shared by rados_object_perf.py and analyze-roperf-logs.py
+#
+# response times are packed into preallocated chunks of fixed-size
+# records.  a full chunk is handed to a background thread that appends it
+# to a binary response time file, so memory use stays bounded and nothing
+# is left to write at end of run.
+#
+# binary response time file format, all little-endian:
+#
+# header, 64 bytes:
+#   magic        8 bytes   b'ROPERFRT'
+#   version      u16       1
+#   record size  u16       bytes per record, 14
+#   op code      u16       request type of the run, see op_codes
+#   thread ID    32 bytes  UTF-8, NUL padded
+#   clock base   f64       time.time() that record offsets are relative to
+#   padding      10 bytes
+#
+# records, one per request, in completion order:
+#   offset       f64       completion time - clock base, seconds
+#   latency      f32       response time, seconds
+#   op code      u8        request type of this request
+#   status       i8        0 for success, else -errno (clipped to -128)
+#
+# records can be mapped directly with numpy.memmap using record_dtype_spec
+#
+
+import threading, os, struct, time
+
+rsptime_magic = b'ROPERFRT'
+rsptime_version = 1
+header_struct = struct.Struct('<8sHHH32sd10x')
+record_struct = struct.Struct('<dfBb')
+header_size = header_struct.size
+record_size = record_struct.size
+
+# numpy dtype for records, as a list so this module does not need numpy
+
+record_dtype_spec = [ ('offset', '<f8'), ('latency', '<f4'), ('op', 'u1'), ('status', 'i1') ]
+
+# request types are stored as small integers
+
+op_codes = {
+  'write': 1,
+  'read': 2,
+  'list': 3,
+  'omap-write': 4,
+  'omap-read': 5,
+  'cleanup': 6,
+  'mix': 7,     # header only, each record has its own request type
+  'omap-get': 8,
+  'omap-range': 9,
+  'xattr-write': 10,
+  'xattr-read': 11,
+  }
+op_names = dict([ (code, name) for (name, code) in op_codes.items() ])
+
+# records per chunk, 896 KiB per chunk
+
+chunk_records = 65536
+
+class RspTimeRecorder:
+
+  # path - binary file to spool response times to,
+  #        if None, response times are not kept at all
+  # thread_id - thread ID saved in the file header
+  # rq_type - request type of the run, also the default for each record
+
+  def __init__(self, path, thread_id='', rq_type='write'):
+    self.path = path
+    self.records = 0
+    if path is None:
+      return
+    self.op_code = op_codes[rq_type]
+    self.clock_base = time.time()
+    self.chunk = bytearray(record_size * chunk_records)
+    self.next_slot = 0
+    self.full_chunks = []
+    self.closing = False
+    self.cv = threading.Condition()
+    self.spoolf = open(path, 'wb')
+    self.spoolf.write(header_struct.pack(rsptime_magic, rsptime_version, record_size,
+                                         self.op_code, str(thread_id).encode('utf-8')[:32],
+                                         self.clock_base))
+    self.flusher = threading.Thread(target=self.flush_chunks, daemon=True)
+    self.flusher.start()
+
+  # record response time of a request that completed at time now
+  # status is the librados return code, negative errno on failure
+
+  def record(self, now, rsp_time, rq_type=None, status=0):
+    if self.path is None:
+      return
+    op_code = self.op_code
+    if rq_type is not None:
+      op_code = op_codes[rq_type]
+    if status > 0:
+      status = 0
+    elif status < -128:
+      status = -128
+    record_struct.pack_into(self.chunk, self.next_slot, now - self.clock_base,
+                            rsp_time, op_code, status)
+    self.next_slot += record_size
+    self.records += 1
+    if self.next_slot == len(self.chunk):
+      self.hand_off(self.chunk)
+      self.chunk = bytearray(record_size * chunk_records)
+      self.next_slot = 0
+
+  def hand_off(self, chunk):
+    with self.cv:
+      self.full_chunks.append(chunk)
+      self.cv.notify()
+
+  # background thread that writes full chunks to the spool file
+
+  def flush_chunks(self):
+    while True:
+      with self.cv:
+        while len(self.full_chunks) == 0 and not self.closing:
+          self.cv.wait()
+        chunks = self.full_chunks
+        self.full_chunks = []
+        closing = self.closing
+      for c in chunks:
+        self.spoolf.write(c)
+      self.spoolf.flush()
+      if closing:
+        return
+
+  # write out the partially filled chunk and close the spool file
+
+  def close(self):
+    if self.path is None or self.closing:
+      return
+    self.hand_off(self.chunk[0:self.next_slot])
+    with self.cv:
+      self.closing = True
+      self.cv.notify()
+    self.flusher.join()
+    self.spoolf.close()
+
+
+# read the header of a binary response time file
+# returns dictionary of header fields, raises exception if not that format
+
+def read_rsptime_header(rspf):
+  hdr = rspf.read(header_size)
+  if len(hdr) < header_size or not hdr.startswith(rsptime_magic):
+    raise Exception('%s: not a binary response time file' % rspf.name)
+  (magic, version, rec_size, op_code, thread_id, clock_base) = header_struct.unpack(hdr)
+  if version != rsptime_version or rec_size != record_size:
+    raise Exception('%s: unsupported response time file version %d record size %d' %
+                    (rspf.name, version, rec_size))
+  return { 'op': op_names.get(op_code, str(op_code)),
+           'thread_id': thread_id.rstrip(b'\0').decode('utf-8'),
+           'clock_base': clock_base }
+
+
+# iterate over (completion time, response time) pairs in a binary
+# response time file, reading one chunk at a time
+
+def read_rsptimes(path):
+  with open(path, 'rb') as spoolf:
+    clock_base = read_rsptime_header(spoolf)['clock_base']
+    while True:
+      chunk = spoolf.read(record_size * chunk_records)
+      for (offset, rsp_time, op_code, status) in record_struct.iter_unpack(
+                                                  chunk[0:len(chunk) - len(chunk) % record_size]):
+        yield (clock_base + offset, rsp_time)
+      if len(chunk) < record_size * chunk_records:
+        return
+
+
+# export a binary response time file in the original CSV format
+
+def export_csv(spool_path, csv_path):
+  with open(csv_path, 'w') as rspf:
+    for (call_start, call_duration) in read_rsptimes(spool_path):
+      rspf.write('%f, %f\n' % (call_start, call_duration))
+
+
+# log-bucketed latency histogram in the style of HdrHistogram.
+# response times are counted in whole microseconds.  values below
+# 2^sub_bucket_bits get a bucket each, above that every power-of-2 range
+# is split into 2^(sub_bucket_bits-1) equal buckets, so a bucket's width
+# is never more than 1/128 of its value with the default 8 bits.
+# counts are kept sparse, so histograms from different threads can be
+# saved in JSON and merged exactly without shipping per-request data
+
+usec_per_sec = 1000000.0
+
+# percentiles reported in results
+
+report_percentiles = [ 50.0, 90.0, 99.0, 99.9 ]
+
+class LatencyHistogram:
+
+  def __init__(self, sub_bucket_bits=8):
+    self.sub_bucket_bits = sub_bucket_bits
+    self.sub_buckets = 1 << sub_bucket_bits
+    self.half_buckets = self.sub_buckets >> 1
+    self.counts = {}
+    self.total = 0
+    self.max_usec = 0
+
+  def bucket_index(self, usec):
+    if usec < self.sub_buckets:
+      return usec
+    shift = usec.bit_length() - self.sub_bucket_bits
+    return self.sub_buckets + (shift - 1) * self.half_buckets + (usec >> shift) - self.half_buckets
+
+  # returns lowest and highest microsecond value counted in a bucket
+
+  def bucket_range(self, index):
+    if index < self.sub_buckets:
+      return (index, index)
+    k = index - self.sub_buckets
+    shift = k // self.half_buckets + 1
+    low = (k % self.half_buckets + self.half_buckets) << shift
+    return (low, low + (1 << shift) - 1)
+
+  # record a response time in seconds
+
+  def record(self, rsp_time):
+    usec = int(rsp_time * usec_per_sec + 0.5)
+    k = self.bucket_index(usec)
+    self.counts[k] = self.counts.get(k, 0) + 1
+    self.total += 1
+    if usec > self.max_usec:
+      self.max_usec = usec
+
+  def merge(self, other):
+    assert(other.sub_bucket_bits == self.sub_bucket_bits)
+    for (k, ct) in other.counts.items():
+      self.counts[k] = self.counts.get(k, 0) + ct
+    self.total += other.total
+    self.max_usec = max(self.max_usec, other.max_usec)
+
+  # response time in seconds that pct percent of requests did not exceed,
+  # reported as the highest value in its bucket, as HdrHistogram does
+
+  def percentile(self, pct):
+    if self.total == 0:
+      return 0.0
+    target = max(1, int(pct / 100.0 * self.total + 0.999999))
+    seen = 0
+    for k in sorted(self.counts.keys()):
+      seen += self.counts[k]
+      if seen >= target:
+        return min(self.bucket_range(k)[1], self.max_usec) / usec_per_sec
+    return self.max_usec / usec_per_sec
+
+  # percentiles and max, with the histogram itself so it can be merged later
+
+  def to_dict(self):
+    d = { 'count': self.total }
+    for pct in report_percentiles:
+      d['p%g' % pct] = self.percentile(pct)
+    d['max'] = self.max_usec / usec_per_sec
+    d['histogram'] = {
+        'sub_bucket_bits': self.sub_bucket_bits,
+        'counts': dict([ (str(k), ct) for (k, ct) in self.counts.items() ]),
+        'max_usec': self.max_usec }
+    return d
+
+
+# rebuild a histogram saved by to_dict()
+
+def histogram_from_dict(d):
+  hd = d['histogram']
+  h = LatencyHistogram(hd['sub_bucket_bits'])
+  h.counts = dict([ (int(k), ct) for (k, ct) in hd['counts'].items() ])
+  h.total = sum(h.counts.values())
+  h.max_usec = hd['max_usec']
+  return h
+
+
+# queue depth at the throughput knee of a --qdepth-search, from
+# (queue depth, throughput) per step: the last step that still gained at
+# least gain_pct percent throughput over the step before it.
+# returns (queue depth, True), or (last queue depth, False) if
+# throughput never leveled off
+
+def find_knee(steps, gain_pct):
+  for k in range(1, len(steps)):
+    prev_thru = steps[k-1][1]
+    if prev_thru <= 0.0 or 100.0 * (steps[k][1] - prev_thru) / prev_thru < gain_pct:
+      return (steps[k-1][0], True)
+  return (steps[-1][0], False)
@@ -0,0 +1,8 @@
+#
+# the modules under test live at the top of the repository, next to
+# the scripts that use them
+#
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+#
+# tests for roperf_access.py
+#
+
+import random
+
+from roperf_access import RandomAccess, ZipfRanks
+
+
+def test_scatter_is_one_to_one():
+  for n in [ 1, 2, 97, 1000, 1024 ]:
+    a = RandomAccess(n, 'uniform', seed=5)
+    assert sorted([ a.item(r) for r in range(0, n) ]) == list(range(0, n))
+
+
+def test_same_seed_same_scatter():
+  (a, b) = (RandomAccess(1000, 'zipf', seed=3), RandomAccess(1000, 'zipf', seed=3))
+  assert [ a.item(r) for r in range(0, 10) ] == [ b.item(r) for r in range(0, 10) ]
+  c = RandomAccess(1000, 'zipf', seed=4)
+  assert [ a.item(r) for r in range(0, 10) ] != [ c.item(r) for r in range(0, 10) ]
+
+
+def test_choices_in_range():
+  rng = random.Random(1)
+  for access in [ 'uniform', 'zipf', 'hotset' ]:
+    for n in [ 1, 3, 1000 ]:
+      a = RandomAccess(n, access, seed=0)
+      assert all([ 0 <= a.choose(rng) < n for k in range(0, 2000) ])
+
+
+# zipf rank frequencies match 1 / k**s, normalized
+
+def test_zipf_frequencies():
+  (n, s, samples) = (50, 0.99, 200000)
+  z = ZipfRanks(n, s)
+  rng = random.Random(7)
+  counts = [ 0 ] * (n + 1)
+  for k in range(0, samples):
+    counts[z.sample(rng)] += 1
+  total_weight = sum([ 1.0 / (k ** s) for k in range(1, n + 1) ])
+  for k in [ 1, 2, 5, 50 ]:
+    expected = samples / (k ** s) / total_weight
+    assert abs(counts[k] - expected) < 5 * expected ** 0.5
+
+
+def test_zipf_exponent_one_and_huge_n():
+  rng = random.Random(2)
+  z = ZipfRanks(10 ** 12, 1.0)
+  ranks = [ z.sample(rng) for k in range(0, 1000) ]
+  assert all([ 1 <= k <= 10 ** 12 for k in ranks ])
+  assert ranks.count(1) > 10
+
+
+def test_hotset_split():
+  rng = random.Random(3)
+  a = RandomAccess(1000, 'hotset', seed=0, hotset_obj_pct=10.0, hotset_rq_pct=90.0)
+  ranks = [ a.rank(rng) for k in range(0, 20000) ]
+  hot = len([ r for r in ranks if r < 100 ])
+  assert abs(hot / 20000.0 - 0.9) < 0.01
+  assert max(ranks) >= 100
@@ -0,0 +1,97 @@
+#
+# tests for roperf_data.py
+#
+
+import zlib
+
+import roperf_data
+from roperf_data import DataPattern, fixed_pattern, checksum_function, object_header, \
+    object_header_size, verify_object
+
+
+def test_fixed_pattern_repeats():
+  p = DataPattern(100, 'fixed')
+  assert bytes(p.buffer('o1')) == (fixed_pattern * 7)[0:100]
+  assert p.buffer('o1') is p.buffer('o2')
+
+
+def test_random_same_for_every_object_and_seed():
+  (a, b) = (DataPattern(10000, 'random', seed=3), DataPattern(10000, 'random', seed=3))
+  assert bytes(a.buffer('o1')) == bytes(a.buffer('o2')) == bytes(b.buffer('o9'))
+  assert bytes(a.buffer('o1')) != bytes(DataPattern(10000, 'random', seed=4).buffer('o1'))
+
+
+def test_unique_differs_by_object():
+  p = DataPattern(4096, 'unique', seed=1)
+  (d1, d2) = (bytes(p.buffer('o0000001-1')), bytes(p.buffer('o0000002-1')))
+  assert len(d1) == len(d2) == 4096
+  assert d1 != d2
+  assert bytes(p.buffer('o0000001-1')) == d1
+
+
+def test_compressibility():
+  p = DataPattern(1 << 16, 'random', compress_pct=50.0)
+  ratio = len(zlib.compress(bytes(p.buffer('o1')))) / float(1 << 16)
+  assert 0.45 < ratio < 0.6
+
+
+def test_checksum_cached_per_offset():
+  p = DataPattern(4096, 'unique')
+  assert p.checksum('o1', zlib.crc32) == zlib.crc32(bytes(p.buffer('o1')))
+  assert p.checksum('o2', zlib.crc32) == zlib.crc32(bytes(p.buffer('o2')))
+  assert len(p.checksums) == 2
+
+
+# a binding that only takes bytes: the pool becomes bytes, or unique
+# windows are copied, and slices handed out before that stay usable
+
+def test_needs_bytes():
+  for pattern in [ 'fixed', 'random', 'unique' ]:
+    p = DataPattern(4096, pattern)
+    before = p.buffer('o1')
+    held = p.view[0:16]
+    p.needs_bytes()
+    after = p.buffer('o1')
+    assert isinstance(after, bytes)
+    assert bytes(before) == after
+    assert bytes(held) == bytes(p.view[0:16])
+    assert p.checksum('o3', zlib.crc32) == zlib.crc32(bytes(p.buffer('o3')))
+
+
+# objects as --verify writes them
+
+def stamped(objnm, data, checksum_name='crc32'):
+  csum = checksum_function(checksum_name)(data)
+  return object_header(objnm, 1, len(data), checksum_name, csum) + data
+
+
+def test_verify_good_object():
+  data = bytes(DataPattern(1000, 'unique').buffer('o1'))
+  assert verify_object('o1', stamped('o1', data)) is None
+  assert verify_object('o1', stamped('o1', b'')) is None
+
+
+def test_verify_long_name():
+  objnm = 'x' * 200
+  assert verify_object(objnm, stamped(objnm, b'abc')) is None
+
+
+def test_verify_finds_problems():
+  obj = stamped('o1', b'some data here')
+  assert 'too short' in verify_object('o1', obj[0:object_header_size - 1])
+  assert 'no object header' in verify_object('o1', b'X' + obj[1:])
+  assert 'header is for object o1' in verify_object('o2', obj)
+  assert 'header says 14 bytes' in verify_object('o1', obj + b'!')
+  assert 'does not match' in verify_object('o1', obj[0:-1] + b'?')
+
+
+def test_verify_unknown_checksum():
+  obj = bytearray(stamped('o1', b'abc'))
+  obj[10:12] = (99).to_bytes(2, 'little')
+  assert 'checksum 99 is not available' in verify_object('o1', bytes(obj))
+
+
+def test_verify_missing_checksum_module(monkeypatch):
+  obj = stamped('o1', b'abc')
+  monkeypatch.setattr(roperf_data, 'checksum_function', lambda name: None)
+  assert 'crc32 is not available' in verify_object('o1', obj)
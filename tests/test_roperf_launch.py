@@ -0,0 +1,61 @@
+#
+# tests for roperf_launch.py, using LocalTransport in place of ssh
+#
+
+import os
+
+from roperf_launch import OK, remote_dir, unknown_status, LocalTransport
+from roperf_launch import on_all_hosts, host_launch_cmd, parse_exit_status
+
+
+def test_connect_makes_host_dir(tmp_path):
+  t = LocalTransport(str(tmp_path))
+  assert t.connect('hostA') == OK
+  assert os.path.isdir(os.path.join(str(tmp_path), 'hostA'))
+
+
+def test_run_in_host_dir(tmp_path):
+  t = LocalTransport(str(tmp_path))
+  out_path = str(tmp_path / 'out')
+  assert t.run('hostA', 'pwd ; exit 3', out_path) == 3
+  with open(out_path) as outf:
+    assert outf.read().strip() == os.path.join(str(tmp_path), 'hostA')
+
+
+def test_copy_to_and_from(tmp_path):
+  t = LocalTransport(str(tmp_path / 'hosts'))
+  src = tmp_path / 'src.py'
+  src.write_text('print(1)\n')
+  assert t.copy_to('hostA', [ str(src) ], remote_dir) == OK
+  copied = tmp_path / 'hosts' / 'hostA' / remote_dir / 'src.py'
+  assert copied.read_text() == 'print(1)\n'
+  (copied.parent / 'rados-wl-thread-001.log').write_text('log\n')
+  local_dir = tmp_path / 'logs'
+  local_dir.mkdir()
+  assert t.copy_from('hostA', '%s/rados-wl-thread-*' % remote_dir, str(local_dir)) == OK
+  assert sorted(os.listdir(str(local_dir))) == [ 'rados-wl-thread-001.log' ]
+
+
+def test_on_all_hosts_keeps_order():
+  assert on_all_hosts([ 'a', 'b', 'c' ], lambda h: h.upper()) == [ 'A', 'B', 'C' ]
+
+
+# start two threads on one host and read back each one's exit status
+
+def test_launch_reports_each_thread(tmp_path):
+  t = LocalTransport(str(tmp_path / 'hosts'))
+  os.makedirs(os.path.join(t.host_dir('hostA'), remote_dir))
+  cmd = host_launch_cmd([ ('001', 'echo one'), ('002', "sh -c 'exit 3'") ])
+  out_path = str(tmp_path / 'launch.hostA')
+  assert t.start('hostA', cmd, out_path).wait() == OK
+  status = parse_exit_status(out_path, [ '001', '002', '003' ])
+  assert status == { '001': 0, '002': 3, '003': unknown_status }
+  thread_log = tmp_path / 'hosts' / 'hostA' / remote_dir / 'rados-wl-thread-001.log'
+  assert thread_log.read_text() == 'one\n'
+
+
+def test_launch_fails_without_remote_dir(tmp_path):
+  t = LocalTransport(str(tmp_path))
+  out_path = str(tmp_path / 'launch.hostA')
+  assert t.run('hostA', host_launch_cmd([ ('001', 'true') ]), out_path) != OK
+  assert parse_exit_status(out_path, [ '001' ]) == { '001': unknown_status }
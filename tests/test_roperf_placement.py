@@ -0,0 +1,66 @@
+#
+# tests for roperf_placement.py
+#
+
+import pytest
+
+from roperf_placement import str_hash_rjenkins, stable_mod, pg_num_mask, object_pg, \
+    pg_balanced_names, pg_object_counts
+
+
+def objnm(j):
+  return 'o%07d-1' % j
+
+
+# expected hashes from a C build of ceph_str_hash_rjenkins(),
+# covering the 0 to 11 byte tails, whole 12 byte blocks and non-ASCII bytes
+
+@pytest.mark.parametrize('key, expected', [
+  ('', 0xbd49d10d),
+  ('a', 0x29eec818),
+  ('foo', 0x7fc1f406),
+  ('o0000000-1', 0xf433109b),
+  ('o0000123-thr1', 0x4ac0f46f),
+  ('0123456789ab', 0x92f31ad0),
+  ('0123456789abcdefghijklmnopqrstuvwxyz', 0xbfbe133d),
+  ('threads_ready', 0xfba1fdb3),
+  ('héllo wörld, ümlaut', 0x41ecd20c),
+  ])
+def test_str_hash_rjenkins(key, expected):
+  assert str_hash_rjenkins(key.encode('utf-8')) == expected
+
+
+def test_stable_mod():
+  assert pg_num_mask(1) == 0
+  assert pg_num_mask(8) == 7
+  assert pg_num_mask(12) == 15
+  assert [ stable_mod(x, 12, 15) for x in range(0, 16) ] == \
+      [ 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 4, 5, 6, 7 ]
+  assert [ stable_mod(x, 8, 7) for x in range(0, 16) ] == [ x % 8 for x in range(0, 16) ]
+
+
+# growing pg_num only splits PGs, an object either stays or moves to a new PG
+
+def test_object_pg_split():
+  for j in range(0, 1000):
+    (before, after) = (object_pg(objnm(j), 12), object_pg(objnm(j), 13))
+    assert after == before or (before == 4 and after == 12)
+
+
+@pytest.mark.parametrize('count, pg_num', [ (64, 64), (100, 32), (10, 32), (1000, 12), (1, 1) ])
+def test_pg_balanced_names(count, pg_num):
+  names = pg_balanced_names(objnm, count, pg_num)
+  assert len(names) == count
+  assert len(set(names)) == count
+  per_pg = pg_object_counts(names, pg_num)
+  assert sum(per_pg) == count
+  assert max(per_pg) - min(per_pg) <= 1
+  assert names == pg_balanced_names(objnm, count, pg_num)
+
+
+def test_pg_object_counts():
+  names = [ objnm(j) for j in range(0, 200) ]
+  per_pg = pg_object_counts(names, 16)
+  assert len(per_pg) == 16
+  for pg in range(0, 16):
+    assert per_pg[pg] == len([ n for n in names if object_pg(n, 16) == pg ])
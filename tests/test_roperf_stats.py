@@ -0,0 +1,149 @@
+#
+# tests for roperf_stats.py
+#
+
+import json
+import pytest
+
+import roperf_stats
+from roperf_stats import LatencyHistogram, histogram_from_dict, usec_per_sec
+from roperf_stats import RspTimeRecorder, read_rsptime_header, read_rsptimes, export_csv
+from roperf_stats import header_size, record_size, record_struct, record_dtype_spec, op_codes
+from roperf_stats import find_knee
+
+
+def test_buckets_cover_their_values():
+  h = LatencyHistogram()
+  for usec in list(range(0, 5000)) + [ 65535, 65536, 1 << 20, 123456789 ]:
+    (low, high) = h.bucket_range(h.bucket_index(usec))
+    assert low <= usec <= high
+
+
+def test_bucket_width_is_small():
+  h = LatencyHistogram()
+  for usec in [ 256, 1000, 4095, 99999, 1 << 30 ]:
+    (low, high) = h.bucket_range(h.bucket_index(usec))
+    assert high - low + 1 <= usec / 128.0
+
+
+def test_percentiles():
+  h = LatencyHistogram()
+  assert h.percentile(99.0) == 0.0
+  for ms in range(1, 101):
+    h.record(ms / 1000.0)
+  assert h.total == 100
+  assert abs(h.percentile(50.0) - 0.050) <= 0.050 / 128
+  assert abs(h.percentile(99.0) - 0.099) <= 0.099 / 128
+  assert h.percentile(100.0) == 0.1
+  assert h.max_usec / usec_per_sec == 0.1
+
+
+def test_merge_same_as_recording_together():
+  (a, b, both) = (LatencyHistogram(), LatencyHistogram(), LatencyHistogram())
+  for k in range(1, 500):
+    (a if k % 3 else b).record(k * 0.0007)
+    both.record(k * 0.0007)
+  a.merge(b)
+  assert a.counts == both.counts
+  assert a.total == both.total
+  assert a.max_usec == both.max_usec
+
+
+def test_dict_round_trip_through_json():
+  h = LatencyHistogram()
+  for k in range(1, 1000):
+    h.record(k * 0.00013)
+  d = json.loads(json.dumps(h.to_dict()))
+  assert d['count'] == 999
+  h2 = histogram_from_dict(d)
+  assert h2.counts == h.counts
+  assert h2.total == h.total
+  assert h2.percentile(99.9) == h.percentile(99.9)
+
+
+# record response times, spilling over several chunks, and read them back
+
+def test_rsptime_file_round_trip(tmp_path, monkeypatch):
+  monkeypatch.setattr(roperf_stats, 'chunk_records', 4)
+  path = str(tmp_path / 'thr1.rsp')
+  r = RspTimeRecorder(path, 'thr1', 'write')
+  base = r.clock_base
+  for k in range(0, 10):
+    r.record(base + k, k / 1000.0)
+  r.close()
+  with open(path, 'rb') as rspf:
+    hdr = read_rsptime_header(rspf)
+  assert hdr == { 'op': 'write', 'thread_id': 'thr1', 'clock_base': base }
+  rsptimes = list(read_rsptimes(path))
+  assert len(rsptimes) == 10
+  for (k, (done, rsp_time)) in enumerate(rsptimes):
+    assert abs(done - (base + k)) < 1e-6
+    assert abs(rsp_time - k / 1000.0) < 1e-6
+
+
+def test_rsptime_record_fields(tmp_path):
+  path = str(tmp_path / 'mix.rsp')
+  r = RspTimeRecorder(path, '7', 'mix')
+  r.record(r.clock_base + 1.5, 0.25, 'omap-write', -5)
+  r.record(r.clock_base + 2.0, 0.5, 'read', -300)
+  r.record(r.clock_base + 2.5, 0.75, None, 4096)
+  r.close()
+  with open(path, 'rb') as rspf:
+    data = rspf.read()
+  assert len(data) == header_size + 3 * record_size
+  records = list(record_struct.iter_unpack(data[header_size:]))
+  assert records == [ (1.5, 0.25, op_codes['omap-write'], -5),
+                      (2.0, 0.5, op_codes['read'], -128),
+                      (2.5, 0.75, op_codes['mix'], 0) ]
+
+
+def test_record_dtype_matches_record_size():
+  field_sizes = { '<f8': 8, '<f4': 4, 'u1': 1, 'i1': 1 }
+  assert sum([ field_sizes[t] for (name, t) in record_dtype_spec ]) == record_size
+
+
+def test_memmap_reads_records(tmp_path):
+  numpy = pytest.importorskip('numpy')
+  path = str(tmp_path / 'thr1.rsp')
+  r = RspTimeRecorder(path, 'thr1', 'read')
+  for k in range(0, 5):
+    r.record(r.clock_base + k, 0.001 * k)
+  r.close()
+  records = numpy.memmap(path, dtype=numpy.dtype(record_dtype_spec), mode='r', offset=header_size)
+  assert list(records['offset']) == [ 0.0, 1.0, 2.0, 3.0, 4.0 ]
+
+
+def test_not_a_rsptime_file(tmp_path):
+  path = tmp_path / 'thr1.csv'
+  path.write_text('1.0, 0.5\n')
+  with pytest.raises(Exception):
+    with open(str(path), 'rb') as rspf:
+      read_rsptime_header(rspf)
+
+
+def test_export_csv(tmp_path):
+  spool = str(tmp_path / 'thr1.rsp.spool')
+  r = RspTimeRecorder(spool, 'thr1', 'write')
+  r.record(r.clock_base + 1.0, 0.5)
+  r.close()
+  csv_path = str(tmp_path / 'thr1.csv')
+  export_csv(spool, csv_path)
+  with open(csv_path) as csvf:
+    lines = csvf.read().splitlines()
+  assert lines == [ '%f, %f' % (r.clock_base + 1.0, 0.5) ]
+
+
+def test_knee_where_gain_drops():
+  steps = [ (1, 100.0), (2, 190.0), (4, 350.0), (8, 370.0), (16, 500.0) ]
+  assert find_knee(steps, 10.0) == (4, True)
+
+
+def test_no_knee_while_still_gaining():
+  steps = [ (1, 100.0), (2, 200.0), (4, 400.0) ]
+  assert find_knee(steps, 10.0) == (4, False)
+  assert find_knee([ (8, 1000.0) ], 10.0) == (8, False)
+
+
+def test_knee_at_zero_or_falling_throughput():
+  assert find_knee([ (1, 0.0), (2, 50.0) ], 10.0) == (1, True)
+  assert find_knee([ (1, 100.0), (2, 80.0) ], 10.0) == (1, True)